@@ -1,7 +1,9 @@
 # [module] known
-import known.basic
-import known.html
-import known.ds
-import known.ds.ftypes
-import known.ds.storage
-import known.ds.struct
\ No newline at end of file
+import importlib
+#<--- submodules are imported on first use, e.g. known.basic imports known/basic.py when it is first accessed
+__all__ = ['basic', 'html', 'ds']
+def __getattr__(name):
+    if name in __all__: return importlib.import_module('.' + name, __name__)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,9 @@
+# [module] known.ds
+import importlib
+#<--- submodules are imported on first use, e.g. known.ds.struct imports known/ds/struct.py when it is first accessed
+__all__ = ['ftypes', 'storage', 'struct', 'bulk', 'bench']
+def __getattr__(name):
+    if name in __all__: return importlib.import_module('.' + name, __name__)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,239 @@
+#-----------------------------------------------------------------------------------------------------
+# bench.py
+#-----------------------------------------------------------------------------------------------------
+import os, sys, json, time, random, shutil, platform, subprocess, tracemalloc
+from known.ds.struct import iTOR
+from known.ds.storage import FORAGE, CFORAGE
+from known.ds.ftypes import TEXT, JSON
+#-----------------------------------------------------------------------------------------------------
+"""
+    benchmarks for iTOR and FORAGE/CFORAGE - run from command line as
+        python -m known.ds.bench results.json [--rows 100000] [--compare baseline.json]
+        python -m known.ds.bench imports.json --imports   (only import times of IMPORTS)
+
+    the results of a run are saved as json and can be compared with results of another run using compare()
+    every case is timed without tracemalloc, then (if memory=True) run again under tracemalloc for peak memory
+"""
+
+#------------------------------------
+# synthetic datasets
+#------------------------------------
+DISTS = {                               # unit size distribution : (rng, mean size) -> size of a unit
+    'fixed' :   lambda r, s: s,
+    'uniform' : lambda r, s: r.randint(0, 2*s),
+    'exp' :     lambda r, s: min(int(r.expovariate(1/s)), 64*s) if s else 0,
+}
+def dataset(rows, units, size, dist='fixed', seed=0):
+    """ generator - yields rows of units (str) of random letters, the same args always yield the same rows
+            rows = no of rows, units = no of units in a row, size = (mean) no of chars in a unit
+            dist = distribution of unit sizes (see DISTS) """
+    if dist not in DISTS: raise Exception('! Unknown distribution [{}] - should be one of {} !'.format(dist, list(DISTS)))
+    r, f = random.Random(seed), DISTS[dist]
+    pool = ''.join(r.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(1<<16)) #<--- units are slices of a random pool
+    pool += pool
+    for _ in range(rows):
+        row = []
+        for _ in range(units):
+            n = min(f(r, size), 1<<16)
+            a = r.randrange(1<<16)
+            row.append(pool[a:a+n])
+        yield row
+
+
+#------------------------------------
+# timing
+#------------------------------------
+def measure(fn, ops, nbytes=0, memory=True):
+    """ calls fn() and returns a dict of measurements
+            ops = no of operations done by fn (rows, files, ...), nbytes = no of bytes processed by fn """
+    t = time.perf_counter()
+    fn()
+    t = time.perf_counter() - t
+    res = { 'seconds': t, 'ops': ops, 'ops_per_sec': ops/t if t else 0.0, 'mb_per_sec': nbytes/(1<<20)/t if t else 0.0 }
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            res['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return res
+def latency(fn, args, memory=True):
+    """ calls fn(arg) for every arg and returns a dict of measurements with percentiles of latency (microseconds) """
+    clock, lat = time.perf_counter, []
+    for x in args:
+        t = clock()
+        fn(x)
+        lat.append(clock() - t)
+    lat.sort()
+    n, t = len(lat), sum(lat)
+    res = { 'seconds': t, 'ops': n, 'ops_per_sec': n/t if t else 0.0 }
+    for p in (50, 90, 99):
+        res['p{}_us'.format(p)] = lat[min(n-1, (n*p)//100)]*1e6 if n else 0.0
+    res['max_us'] = lat[-1]*1e6 if n else 0.0
+    if memory:
+        tracemalloc.start()
+        try:
+            for x in args: fn(x)
+            res['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return res
+
+
+#------------------------------------
+# cases
+#------------------------------------
+def _itor(d, data, nbytes, samples, seed, memory, p):
+    res, path = {}, os.path.join(d, 'itor')
+    t = iTOR.create(path)
+    def write():
+        t.open('w')
+        t.write(*data)
+        t.close()
+    res['itor.write'] = measure(write, len(data), nbytes, memory)
+    p('itor.write', res['itor.write'])
+    res['itor.open'] = measure(lambda: t.open('r') or t.close(), 1, 0, memory)
+    res['itor.open_lazy'] = measure(lambda: t.open('r', lazy=True) or t.close(), 1, 0, memory)
+    res['itor.iterR'] = measure(lambda: sum(1 for _ in t.iterR()), len(data), nbytes, memory)
+    p('itor.iterR', res['itor.iterR'])
+    r = random.Random(seed)
+    rows = [ r.randrange(len(data)) for _ in range(samples) ] if data else []
+    for mode in ('r', 'm', 'p'):
+        t.open(mode)
+        res['itor.readR.' + mode] = latency(t.readR, rows, memory)
+        p('itor.readR.' + mode, res['itor.readR.' + mode])
+        res['itor.read.' + mode] = measure(lambda: t.read(*rows), len(rows), 0, memory)
+        res['itor.readC.' + mode] = measure(lambda: t.readC(0), len(data), 0, memory)
+        t.close()
+    return res
+def _forage(d, files, size, seed, memory, p):
+    res = {}
+    text = list(dataset(files, 1, size, 'fixed', seed))
+    f = FORAGE.create(d, 'forage.json')
+    f.register(bench='forage')
+    res['forage.save'] = measure(lambda: [ f.save('bench', '{}.txt'.format(k), x[0], TEXT) for k,x in enumerate(text) ],
+                                files, files*size, memory)
+    res['forage.load'] = measure(lambda: [ f.load('bench', '{}.txt'.format(k), TEXT) for k in range(files) ],
+                                files, files*size, memory)
+    c = CFORAGE.create(d, 'cforage.json', JSON)
+    c.register(bench='cforage')
+    res['cforage.save'] = measure(lambda: [ c.save('bench', '{}.json'.format(k), x) for k,x in enumerate(text) ],
+                                files, files*size, memory)
+    res['cforage.load'] = measure(lambda: [ c.load('bench', '{}.json'.format(k)) for k in range(files) ],
+                                files, files*size, memory)
+    for k in ('forage.save', 'forage.load', 'cforage.save', 'cforage.load'): p(k, res[k])
+    return res
+IMPORTS = ('known', 'known.basic', 'known.ds.ftypes', 'known.ds.storage', 'known.ds.struct')
+HEAVY = ('numpy', 'matplotlib')
+def imports(modules=IMPORTS, repeat=5, p=print):
+    """ measures time taken to import each module in a new python process (best of repeat runs)
+            also records which of HEAVY modules got imported along with it """
+    res, src = {}, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) #<--- dir containing known
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ src ] + ([ os.environ['PYTHONPATH'] ] if os.environ.get('PYTHONPATH') else [])))
+    for m in modules:
+        code = ('import sys, time, json; t = time.perf_counter(); import {}; t = time.perf_counter() - t; '
+                'print(json.dumps([t, [ x for x in {} if x in sys.modules ]]))').format(m, list(HEAVY))
+        best, heavy = None, []
+        for _ in range(repeat):
+            t, heavy = json.loads(subprocess.run([ sys.executable, '-c', code ], env=env, capture_output=True, check=True, text=True).stdout)
+            best = t if best is None else min(best, t)
+        res['import.' + m] = { 'seconds': best, 'ops': 1, 'ops_per_sec': 1/best if best else 0.0, 'heavy': heavy }
+        p('import.' + m, res['import.' + m])
+    return res
+def run(dir, rows=100000, units=8, size=16, dist='fixed', seed=0, samples=10000, files=1000, file_size=4096, memory=True, p=print):
+    """ runs all cases on synthetic data in a (temporary) directory dir and returns the results
+            rows, units, size, dist, seed   = dataset used for iTOR cases (see dataset())
+            samples                         = no of random rows read by latency cases
+            files, file_size                = no of files and their size (chars) used for FORAGE and CFORAGE cases """
+    d = os.path.join(dir, 'known-bench-{}'.format(os.getpid()))
+    os.makedirs(d, exist_ok=True)
+    try:
+        data = list(dataset(rows, units, size, dist, seed))
+        nbytes = sum(len(u) + 1 for row in data for u in row) + len(data) #<--- approximate for non-ascii units
+        cases = imports(p=p)
+        cases.update(_itor(d, data, nbytes, samples, seed, memory, p))
+        del data
+        cases.update(_forage(d, files, file_size, seed, memory, p))
+    finally:
+        shutil.rmtree(d, ignore_errors=True)
+    return { 'meta': meta({ 'rows': rows, 'units': units, 'size': size, 'dist': dist, 'seed': seed, 'samples': samples,
+                            'files': files, 'file_size': file_size }, memory=memory),
+             'cases': cases }
+def meta(args, **info):
+    """ returns a dict describing this run - args should be the same for comparable runs """
+    return dict({ 'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': sys.version.split()[0],
+                  'platform': platform.platform(), 'machine': platform.machine(), 'cpus': os.cpu_count(), 'args': args }, **info)
+
+
+#------------------------------------
+# results
+#------------------------------------
+def save(path, res):
+    with open(path, 'w') as f:
+        f.write(json.dumps(res, sort_keys=False, indent=4))
+    return path
+def load(path):
+    with open(path, 'r') as f:
+        res = json.loads(f.read())
+    return res
+LOWER = ('seconds', 'peak_bytes', 'p50_us', 'p90_us', 'p99_us', 'max_us') #<--- metrics where lower is better
+HIGHER = ('ops_per_sec', 'mb_per_sec')
+def compare(old, new, threshold=0.1, metrics=('ops_per_sec', 'p99_us', 'peak_bytes')):
+    """ compares the results of 2 runs (dicts returned by run() or load()) case by case
+            returns a list of dicts - one for each metric of a case found in both runs
+            status is 'better' or 'worse' if the change is more than threshold (fraction) else 'same' """
+    res = []
+    if old['meta'].get('args')!=new['meta'].get('args'):
+        print('! Runs used different arguments - results may not be comparable !')
+    for case, a in old['cases'].items():
+        b = new['cases'].get(case, None)
+        if b is None: continue
+        for m in metrics:
+            if m not in a or m not in b: continue
+            x, y = a[m], b[m]
+            change = (y - x)/x if x else 0.0
+            status = 'same'
+            if abs(change) > threshold:
+                status = 'better' if ((change > 0) == (m in HIGHER)) else 'worse'
+            res.append({ 'case': case, 'metric': m, 'old': x, 'new': y, 'change': change, 'status': status })
+    return res
+def report(cmp, p=print):
+    """ prints the output of compare(), returns the no of metrics that got worse """
+    for x in cmp:
+        p('{:<8}{:<24}{:<14}{:>16.2f}{:>16.2f}{:>+10.1%}'.format(x['status'], x['case'], x['metric'], x['old'], x['new'], x['change']))
+    return sum([ 1 for x in cmp if x['status']=='worse' ])
+
+
+#------------------------------------
+# command line
+#------------------------------------
+def main(args=None):
+    import argparse
+    a = argparse.ArgumentParser(prog='python -m known.ds.bench', description='benchmarks for iTOR and FORAGE/CFORAGE')
+    a.add_argument('output', help='json file to save results')
+    a.add_argument('--dir', default='.', help='directory for temporary data')
+    a.add_argument('--rows', type=int, default=100000)
+    a.add_argument('--units', type=int, default=8)
+    a.add_argument('--size', type=int, default=16)
+    a.add_argument('--dist', default='fixed', choices=list(DISTS))
+    a.add_argument('--seed', type=int, default=0)
+    a.add_argument('--samples', type=int, default=10000)
+    a.add_argument('--files', type=int, default=1000)
+    a.add_argument('--file-size', type=int, default=4096)
+    a.add_argument('--no-memory', action='store_true', help='skip tracemalloc runs')
+    a.add_argument('--imports', action='store_true', help='only measure import times')
+    a.add_argument('--compare', default=None, help='json file of an earlier run - exits with 1 if any metric got worse')
+    a.add_argument('--threshold', type=float, default=0.1)
+    x = a.parse_args(args)
+    p = lambda k, r: print('{:<24}{:>14.1f} ops/s'.format(k, r['ops_per_sec']))
+    if x.imports:
+        res = { 'meta': meta({ 'imports': list(IMPORTS) }), 'cases': imports(p=p) }
+    else:
+        res = run(x.dir, x.rows, x.units, x.size, x.dist, x.seed, x.samples, x.files, x.file_size, not x.no_memory, p=p)
+    save(x.output, res)
+    if x.compare: return 1 if report(compare(load(x.compare), res, x.threshold)) else 0
+    return 0
+
+if __name__=='__main__': sys.exit(main())
+#-----------------------------------------------------------------------------------------------------
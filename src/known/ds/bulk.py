@@ -0,0 +1,147 @@
+#-----------------------------------------------------------------------------------------------------
+# bulk.py
+#-----------------------------------------------------------------------------------------------------
+import csv, json, time
+#-----------------------------------------------------------------------------------------------------
+"""
+    streaming export/import between lists of records (iTOR, ziTOR, siTOR) and CSV, JSONL and .npy column files
+
+    rows are moved in batches of upto batch rows - memory used does not depend on the size of the table
+    exports read using iter_batches() (chunked reads), imports write using write() (buffered writes)
+    progress is an optional function like (lambda rows, seconds, rows_per_sec: None) that is called after every batch
+    every function returns a dict of counters - rows, seconds, rows_per_sec
+"""
+
+#------------------------------------
+# progress
+#------------------------------------
+def report(rows, seconds, rows_per_sec):
+    """ a progress function that prints on a single line """
+    print('\r[{}] rows in [{:.1f}]s - [{:.0f}] rows/s'.format(rows, seconds, rows_per_sec), end='', flush=True)
+class _COUNTER:
+    def __init__(self, progress):
+        self.rows, self.t, self.progress = 0, time.perf_counter(), progress
+    def __call__(self, n):
+        self.rows += n
+        if self.progress is not None: self.progress(*self.stats())
+    def stats(self):
+        t = time.perf_counter() - self.t
+        return self.rows, t, (self.rows/t if t else 0.0)
+    def result(self):
+        rows, seconds, rate = self.stats()
+        return { 'rows': rows, 'seconds': seconds, 'rows_per_sec': rate }
+def _import(dst, batches, mode, progress):
+    """ writes batches of rows to dst (opened in mode w/a and closed) """
+    c = _COUNTER(progress)
+    dst.open(mode)
+    try:
+        for rows in batches:
+            dst.write(*rows)
+            c(len(rows))
+    finally:
+        dst.close()
+    return c.result()
+def _batches(rows, batch):
+    """ generator - groups an iterable of rows into lists of upto batch rows """
+    b = []
+    for row in rows:
+        b.append(row)
+        if len(b)>=batch:
+            yield b
+            b = []
+    if b: yield b
+
+
+#------------------------------------
+# CSV
+#------------------------------------
+def to_csv(src, path, header=None, batch=10000, progress=None, **fmt):
+    """ exports all rows of src to a csv file, header is an optional list of column names
+            fmt are passed to csv.writer (e.g. delimiter) """
+    c = _COUNTER(progress)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f, **fmt)
+        if header: w.writerow(header)
+        for rows in src.iter_batches(batch):
+            w.writerows(rows)
+            c(len(rows))
+    return c.result()
+def from_csv(dst, path, header=False, mode='w', batch=10000, progress=None, **fmt):
+    """ imports rows of a csv file into dst, header=True skips the first line
+            mode = w (rewrite dst) or a (append to dst), fmt are passed to csv.reader """
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        r = csv.reader(f, **fmt)
+        if header: next(r, None)
+        return _import(dst, _batches(r, batch), mode, progress)
+
+
+#------------------------------------
+# JSONL
+#------------------------------------
+def to_jsonl(src, path, batch=10000, progress=None):
+    """ exports all rows of src to a json-lines file - one json list per row """
+    c, dumps = _COUNTER(progress), json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    with open(path, 'w', encoding='utf-8') as f:
+        for rows in src.iter_batches(batch):
+            f.write(''.join([ dumps(row) + '\n' for row in rows ]))
+            c(len(rows))
+    return c.result()
+def from_jsonl(dst, path, mode='w', batch=10000, progress=None):
+    """ imports a json-lines file into dst - each line should be a json list (a row), blank lines are skipped """
+    with open(path, 'r', encoding='utf-8') as f:
+        return _import(dst, _batches((json.loads(line) for line in f if line.strip()), batch), mode, progress)
+
+
+#------------------------------------
+# NPY
+#------------------------------------
+#   a .npy file is a header followed by raw array data
+#   columns are written with a fixed size header that is rewritten with the final no of rows at the end
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+NPY_HEAD = 128 #<--- total size of header (bytes), a multiple of 64
+def npy_header(dtype, rows):
+    """ returns a .npy (version 1.0) header of size NPY_HEAD for a 1-d array """
+    import numpy #<--- optional dependency
+    d = "{{'descr': {}, 'fortran_order': False, 'shape': ({},), }}".format(repr(numpy.lib.format.dtype_to_descr(numpy.dtype(dtype))), rows)
+    n = NPY_HEAD - len(NPY_MAGIC) - 2
+    if len(d) + 1 > n: raise Exception('! Header of .npy file is too long for dtype [{}] !'.format(dtype))
+    return NPY_MAGIC + n.to_bytes(2, 'little') + (d.ljust(n - 1) + '\n').encode('latin1')
+def to_npy(src, prefix, cols, batch=10000, progress=None):
+    """ exports columns of src to .npy files named <prefix>.<unit>.npy, returns the counters with paths of files
+            cols = { unit position : dtype } - dtype is any numpy dtype like 'int64', 'float64' or 'U16' (fixed width str)
+            rows that do not have a unit get the default value of its dtype (0 or empty) """
+    import numpy #<--- optional dependency
+    c, fs, paths = _COUNTER(progress), {}, { u: '{}.{}.npy'.format(prefix, u) for u in cols }
+    cols = { u: numpy.dtype(t).newbyteorder('<') for u, t in cols.items() } #<--- .npy files are written little-endian
+    try:
+        for u, t in cols.items():
+            fs[u] = open(paths[u], 'wb')
+            fs[u].write(npy_header(t, 0))
+        for rows in src.iter_batches(batch):
+            for u, t in cols.items():
+                fill = numpy.zeros((), dtype=t).item()
+                col = numpy.asarray([ (row[u] if u < len(row) else fill) for row in rows ], dtype=t)
+                fs[u].write(col.tobytes())
+            c(len(rows))
+        for u, t in cols.items():
+            fs[u].seek(0)
+            fs[u].write(npy_header(t, c.rows))
+    finally:
+        for f in fs.values(): f.close()
+    res = c.result()
+    res['paths'] = paths
+    return res
+def from_npy(dst, paths, mode='w', batch=10000, progress=None):
+    """ imports .npy column files (1-d arrays of equal length, in unit order) into dst
+            files are memory-mapped and converted in batches of rows """
+    import numpy #<--- optional dependency
+    cols = [ numpy.load(p, mmap_mode='r') for p in paths ]
+    n = min([ len(x) for x in cols ]) if cols else 0
+    if any(len(x)!=n for x in cols): raise Exception('! Column files have different lengths {} !'.format([ len(x) for x in cols ]))
+    def batches():
+        for a in range(0, n, batch):
+            yield list(zip(*[ x[a:a+batch].tolist() for x in cols ]))
+    return _import(dst, batches(), mode, progress)
+
+
+#-----------------------------------------------------------------------------------------------------
@@ -1,6 +1,7 @@
 #-----------------------------------------------------------------------------------------------------
 # ftypes.py
 #-----------------------------------------------------------------------------------------------------
+import os
 
 
 class TEXT:
@@ -29,14 +30,110 @@ class JSON:
         return data
 
 
+#<--- heavy backends (numpy, matplotlib) are imported on first call, not when this module is imported
 class NP:
-    from numpy import load
-    from numpy import save
+    def load(*args, **kwargs):
+        """ numpy.load """
+        from numpy import load
+        return load(*args, **kwargs)
+    def save(*args, **kwargs):
+        """ numpy.save """
+        from numpy import save
+        return save(*args, **kwargs)
+
+
+class NPM:
+    """ numpy arrays in .npy files that can be larger than memory
+        load returns a read-only memory-mapped array (see mmap for other modes)
+        append adds rows to the end of an existing file and updates the shape in its header
+        rows reads a slice of rows without reading the rest of the file
+    """
+    CHUNK = 1<<24 #<--- bytes copied at a time when a file is rewritten
+    def save(path, data):
+        """ numpy.save """
+        from numpy import save
+        save(path, data)
+        return path
+    def load(path):
+        return NPM.mmap(path, 'r')
+    def mmap(path, mode='r'):
+        """ returns a memory-mapped array, mode is 'r', 'r+' or 'c' (see numpy.memmap) """
+        from numpy import load
+        return load(path, mmap_mode=mode)
+    def info(path):
+        """ returns (dtype, shape, fortran_order, version, position of data) of a .npy file """
+        from numpy.lib import format
+        with open(path, 'rb') as f:
+            v = format.read_magic(f)
+            shape, fortran, dtype = (format.read_array_header_1_0 if v==(1,0) else format.read_array_header_2_0)(f)
+            return dtype, shape, fortran, v, f.tell()
+    def _header(dtype, shape, fortran, v, n):
+        """ returns a .npy header of n bytes (or the smallest multiple of 64 with room to grow if n is None) - None if it does not fit """
+        from numpy.lib import format
+        d = "{{'descr': {!r}, 'fortran_order': {!r}, 'shape': {!r}, }}".format(format.dtype_to_descr(dtype), fortran, tuple(int(x) for x in shape))
+        lb = 2 if v==(1,0) else 4 #<--- no of bytes of header length
+        if n is None: n = -(-(8 + lb + len(d) + 1 + 32)//64)*64
+        h = n - 8 - lb
+        if len(d) + 1 > h: return None
+        return format.magic(*v) + h.to_bytes(lb, 'little') + (d.ljust(h - 1) + '\n').encode('latin1')
+    def append(path, data):
+        """ appends rows (along first axis) to an existing .npy file, data should have the same dtype and shape of rows
+            the header is rewritten in place (the whole file is copied only if the new shape does not fit in it) """
+        from numpy import asarray
+        dtype, shape, fortran, v, a = NPM.info(path)
+        if fortran or not shape: raise Exception('! Can only append to a C-ordered array with at least 1 dimension [{}] !'.format(path))
+        data = asarray(data, dtype=dtype)
+        if data.shape[1:]!=tuple(shape[1:]): 
+            raise Exception('! Shape of rows {} does not match shape of array {} !'.format(data.shape[1:], tuple(shape[1:])))
+        if not len(data): return path
+        b = a + dtype.itemsize*int(asarray(shape).prod())
+        new = (shape[0] + len(data),) + tuple(shape[1:])
+        head = NPM._header(dtype, new, False, v, a)
+        if head is None: #<--- rewrite with a larger header
+            tmp = path + '.tmp'
+            with open(path, 'rb') as f, open(tmp, 'wb') as g:
+                g.write(NPM._header(dtype, new, False, v, None))
+                f.seek(a)
+                while a < b:
+                    x = f.read(min(NPM.CHUNK, b - a))
+                    if not x: raise Exception('! Data of .npy file is shorter than its header says [{}] !'.format(path))
+                    g.write(x)
+                    a += len(x)
+                g.write(data.tobytes())
+            os.replace(tmp, path)
+            return path
+        with open(path, 'r+b') as f:
+            f.seek(b)
+            f.truncate() #<--- drop bytes of an append that was interrupted
+            f.write(data.tobytes())
+            f.flush()
+            f.seek(0)
+            f.write(head) #<--- rows are written before the header that includes them
+        return path
+    def rows(path, start, stop=None):
+        """ reads rows [start:stop] of an array (upto the end if stop is None) using a single read """
+        from numpy import frombuffer
+        dtype, shape, fortran, v, a = NPM.info(path)
+        if fortran or not shape: raise Exception('! Can only read rows of a C-ordered array with at least 1 dimension [{}] !'.format(path))
+        start, stop, _ = slice(start, stop).indices(shape[0])
+        stop = max(start, stop)
+        r = dtype.itemsize
+        for x in shape[1:]: r *= x
+        with open(path, 'rb') as f:
+            f.seek(a + start*r)
+            buffer = f.read((stop - start)*r)
+        return frombuffer(buffer, dtype=dtype).reshape((stop - start,) + tuple(shape[1:])).copy()
 
 
 class IM:
-    from matplotlib.pyplot import imread as load
-    from matplotlib.pyplot import imsave as save
+    def load(*args, **kwargs):
+        """ matplotlib.pyplot.imread """
+        from matplotlib.pyplot import imread
+        return imread(*args, **kwargs)
+    def save(*args, **kwargs):
+        """ matplotlib.pyplot.imsave """
+        from matplotlib.pyplot import imsave
+        return imsave(*args, **kwargs)
 
 
 class FIG:
@@ -1,7 +1,12 @@
 #-----------------------------------------------------------------------------------------------------
 # storage.py
 #-----------------------------------------------------------------------------------------------------
-import os, json
+import os, json, time
+from threading import Lock
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+from bisect import bisect_left, insort
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
 #------------------------------------
@@ -18,6 +23,9 @@ class STORAGE:
         self.root       abs path of root dir which is the dir containing storage file
                         Note: 'root_relative_paths' are relative to this root
         self.stores     a dictionary of 'store_alias' v/s 'root_relative_paths' <-- contents of storage file
+        self.prefix     a dictionary of 'store_alias' v/s precomputed path prefixes (see _prefix)
+                        Note: prefixes are rebuilt when the cwd changes
+        self.manifest   a dictionary of 'store_alias' v/s loaded manifest (see refresh)
 
     """
     def create(root, storage, auto_load=True, auto_save=True):
@@ -39,6 +47,8 @@ class STORAGE:
         self.storage = os.path.abspath(storage) # stores abs paths in instances
         self.root = os.path.dirname(self.storage) # abs dir name <-- root
         self.autosave = auto_save
+        self.prefix = {}
+        self.manifest = {}
 
         self.create_config() if auto_create else None #<-- create if not existing, it has no effect if storage exists
         self.load_config() if auto_load else None # without calling load_config(), self.stores will not be created
@@ -47,6 +57,7 @@ class STORAGE:
         if os.path.exists(self.storage):
             with open(self.storage, 'r') as f:
                 self.stores = json.loads(f.read())
+            self._prefixes()
             return True
         else:
             return False
@@ -71,20 +82,57 @@ class STORAGE:
             self.stores[alias] = root_rel_path
             full_path =  os.path.join(self.root, root_rel_path)
             os.makedirs( full_path, exist_ok=True )
+            self.prefix[alias] = self._prefix(root_rel_path)
         return self.save_config() if self.autosave else None #<=== save json after adding
 
 
+    #------------------------------------
+    # path prefix
+    #------------------------------------
+    SEPS = (os.sep, os.altsep) if os.altsep else (os.sep,)
+    def _prefix(self, root_rel_path):
+        """ returns 4-tuple (s,r,a,p) where s is root_rel_path and r,a,p are prefixes of paths (see paths()) """
+        a = os.path.join(self.root, root_rel_path)
+        p = os.path.relpath(a, self.cwd)
+        return root_rel_path, os.path.join(root_rel_path, ''), os.path.join(a, ''), ('' if p=='.' else os.path.join(p, ''))
+
+    def _prefixes(self):
+        """ rebuilds prefixes of all stores for current cwd """
+        self.cwd = os.getcwd()
+        self.prefix = { alias: self._prefix(root_rel_path) for alias, root_rel_path in self.stores.items() }
+
+    def _plain(file):
+        """ True if file is a relative path that does not need normalisation (no empty, '.' or '..' parts) """
+        if not file or file[0] in STORAGE.SEPS or os.path.isabs(file): return False
+        if os.altsep: file = file.replace(os.altsep, os.sep)
+        for x in file.split(os.sep):
+            if x in ('', '.', '..'): return False
+        return True
+
+    def _get(self, alias):
+        """ returns prefixes of a store, rebuilds them if cwd or the store has changed """
+        if os.getcwd()!=self.cwd: self._prefixes()
+        x = self.prefix.get(alias, None)
+        if x is None or x[0]!=self.stores[alias]: 
+            x = self.prefix[alias] = self._prefix(self.stores[alias])
+        return x
+
+
     #------------------------------------
     # path query 
     #------------------------------------
+    #   paths of plain files are made by joining the precomputed prefix of store with file
     def path_rel(self, alias, file):
-        return os.path.join(self.stores[alias], file) 
+        x = self._get(alias)
+        return x[1] + file if STORAGE._plain(file) else os.path.join(self.stores[alias], file) 
 
     def path_abs(self, alias, file):
-        return os.path.join(os.path.join(self.root, self.stores[alias]), file)
+        x = self._get(alias)
+        return x[2] + file if STORAGE._plain(file) else os.path.join(os.path.join(self.root, self.stores[alias]), file)
 
     def path_py(self, alias, file):
-        return os.path.relpath(os.path.join(os.path.join(self.root, self.stores[alias]), file), self.cwd)
+        x = self._get(alias)
+        return x[3] + file if STORAGE._plain(file) else os.path.relpath(os.path.join(os.path.join(self.root, self.stores[alias]), file), self.cwd)
 
     def paths(self, alias, file): # path_ds replaced by call
         """ returns 3-tuple (r,a,p) paths where
@@ -92,6 +140,8 @@ class STORAGE:
             a = absolute path
             p = python relative path
         """
+        x = self._get(alias)
+        if STORAGE._plain(file): return x[1] + file, x[2] + file, x[3] + file
         root_rel_path = self.stores[alias] #<--- ds path relative to root
         file_root_rel_path = os.path.join(root_rel_path, file) #<--- file path relative to root
 
@@ -106,6 +156,130 @@ class STORAGE:
         return self.path_py(alias, file)     
 
 
+    #------------------------------------
+    # manifest 
+    #------------------------------------
+    #   a manifest is the list of files in a store (including sub-dirs) with their size and mtime
+    #   it is saved next to the storage file as <storage>.<alias>.manifest (json) as
+    #       { 'dirs' : { dir : [ mtime_ns, { name : [ size, mtime_ns ] } ] } }      dir is relative to store ('' for store itself)
+    #   on refresh, a dir is listed (using scandir) only if its mtime has changed - other dirs are just stat-ed
+    #   Note: changes made inside existing files do not change mtime of dir, use refresh(alias, full=True) for those
+    #   files saved using this storage are added to the loaded manifest (it is saved to disk on next refresh)
+    #   files created or removed by other means are found only after a refresh
+    MANIFEST_RACY = 2*10**9 #<--- dirs modified within this many ns of a scan are listed again on next refresh
+    def _mpath(self, alias):
+        return '{}.{}.manifest'.format(self.storage, alias)
+
+    def _mindex(self, alias, dirs):
+        """ loads a manifest in memory along with a sorted list of all file paths """
+        names = sorted([ os.path.join(d, n) for d, (_, fs) in dirs.items() for n in fs ])
+        self.manifest[alias] = { 'dirs': dirs, 'names': names }
+        return self.manifest[alias]
+
+    def _manifest(self, alias):
+        """ returns loaded manifest of a store - loads it from disk or creates it if it does not exist """
+        m = self.manifest.get(alias, None)
+        if m is None:
+            if os.path.exists(self._mpath(alias)):
+                with open(self._mpath(alias), 'r') as f:
+                    m = self._mindex(alias, json.loads(f.read())['dirs'])
+            else:
+                m = self.refresh(alias)
+        return m
+
+    def refresh(self, alias, full=False):
+        """ updates and saves the manifest of a store, full=True lists all dirs again (even if their mtime is unchanged) """
+        old = {}
+        if not full and (alias in self.manifest or os.path.exists(self._mpath(alias))): old = self._manifest(alias)['dirs']
+        base, skip, now = self._get(alias)[2], self.storage, time.time_ns()
+        kids = {}
+        for d in old: 
+            if d: kids.setdefault(os.path.dirname(d), []).append(d)
+        dirs, stack = {}, ['']
+        while stack:
+            d = stack.pop()
+            try:
+                mtime = os.stat(os.path.join(base, d)).st_mtime_ns
+            except (FileNotFoundError, NotADirectoryError): 
+                continue
+            x = old.get(d, None)
+            if x is not None and x[0]==mtime:
+                dirs[d] = x #<--- same entries as before
+                stack.extend(kids.get(d, []))
+                continue
+            fs = {}
+            with os.scandir(os.path.join(base, d)) as it:
+                for e in it:
+                    if e.path.startswith(skip): continue #<--- storage and manifest files
+                    if e.is_dir(follow_symlinks=False):
+                        stack.append(os.path.join(d, e.name))
+                    else:
+                        try:
+                            st = e.stat()
+                        except FileNotFoundError:
+                            continue
+                        fs[e.name] = [ st.st_size, st.st_mtime_ns ]
+            dirs[d] = [ (0 if now - mtime < self.MANIFEST_RACY else mtime), fs ]
+        with open(self._mpath(alias) + '.tmp', 'w') as f:
+            f.write(json.dumps({ 'dirs': dirs }, separators=(',', ':')))
+        os.replace(self._mpath(alias) + '.tmp', self._mpath(alias))
+        return self._mindex(alias, dirs)
+
+    def files(self, alias, pattern=None, prefix=None):
+        """ returns sorted store-relative paths of files in a store from its manifest
+            pattern is a glob like '*.json' matched against the whole relative path (* also matches path seperators)
+            prefix selects paths that start with prefix (uses binary search) """
+        names = self._manifest(alias)['names']
+        if prefix:
+            names = names[bisect_left(names, prefix):bisect_left(names, prefix + chr(0x10ffff))]
+        return [ n for n in names if fnmatchcase(n, pattern) ] if pattern else list(names)
+
+    def stat(self, alias, file):
+        """ returns (size, mtime_ns) of a file from manifest of store or None if it is not found """
+        d, n = os.path.split(os.path.normpath(file))
+        x = self._manifest(alias)['dirs'].get(d, None)
+        x = None if x is None else x[1].get(n, None)
+        return None if x is None else tuple(x)
+
+    def exists(self, alias, file):
+        """ True if a file is found in manifest of store """
+        return self.stat(alias, file) is not None
+
+    def size(self, alias, pattern=None, prefix=None):
+        """ returns total size (bytes) of files in a store (see files for pattern and prefix) """
+        if not (pattern or prefix):
+            return sum([ x[0] for _, fs in self._manifest(alias)['dirs'].values() for x in fs.values() ])
+        return sum([ self.stat(alias, n)[0] for n in self.files(alias, pattern, prefix) ])
+
+    def _mnote(self, alias, file, a=None):
+        """ adds a saved file to loaded manifest of store (if any), a is its abs path """
+        m = self.manifest.get(alias, None)
+        if m is None: return
+        file = os.path.normpath(file)
+        if os.path.isabs(file) or file.split(os.sep)[0]=='..': return #<--- not inside the store
+        try:
+            st = os.stat(a or self.path_abs(alias, file))
+        except OSError: #<--- ftype saved to another path (e.g. NP adds .npy), found on next refresh
+            return
+        d, n = os.path.split(file)
+        x = m['dirs'].get(d, None)
+        if x is None: x = m['dirs'][d] = [ 0, {} ] #<--- a new dir, listed on next refresh
+        if n not in x[1]: insort(m['names'], os.path.join(d, n))
+        x[1][n] = [ st.st_size, st.st_mtime_ns ]
+
+    def _mnotes(self, alias, res, ordered):
+        """ adds the files saved by _many to loaded manifest of store, returns res (see _many) """
+        if ordered:
+            for file, _, e in res:
+                if e is None: self._mnote(alias, file)
+            return res
+        def stream():
+            for x in res:
+                if x[2] is None: self._mnote(alias, x[0])
+                yield x
+        return stream()
+
+
     #------------------------------------
     # file IO 
     #------------------------------------
@@ -113,18 +287,21 @@ class STORAGE:
         """ save a file in this storage using saveF function like (lambda path, data: None) """
         r,a,p = self.paths(alias, file)
         saveF(p, data)
+        self._mnote(alias, file, a)
         return r, a, p
 
     def save_py(self, alias, file, data, saveF):
         """ save a file in this storage using saveF function like (lambda path, data: None) """
         p = self.path_py(alias, file)
         saveF(p, data)
+        self._mnote(alias, file)
         return p
 
     def save_abs(self, alias, file, data, saveF):
         """ save a file in this storage using saveF function like (lambda path, data: None) """
         a = self.path_abs(alias, file)
         saveF(a, data)
+        self._mnote(alias, file, a)
         return a
 
     def load(self, alias, file, loadF):
@@ -144,6 +321,99 @@ class STORAGE:
 
 
 
+#------------------------------------
+# Concurrent file IO
+#------------------------------------
+def _call(fn, *args):
+    """ returns (fn(*args), None) or (None, exception) - module level so that it can be used by other processes """
+    try:
+        return fn(*args), None
+    except Exception as e:
+        return None, e
+
+def _save(save, path, data):
+    save(path, data)
+    return path
+
+def _result(job):
+    try:
+        return job.result()
+    except Exception as e: #<--- e.g. fn could not be pickled for a process pool
+        return None, e
+
+def _many(calls, workers=None, kind='thread', ordered=True):
+    """ runs calls = [(key, fn, args), ...] on a pool of workers, kind is 'thread' or 'process'
+        returns a list of (key, result, error) in order of calls if ordered=True
+        otherwise returns a generator that yields (key, result, error) in the order that calls finish
+        error is None if the call was successful, otherwise result is None
+        Note: with kind='process', fn should be picklable (not a lambda) """
+    if kind not in ('thread', 'process'): raise Exception('! Unknown kind of pool [{}] - should be thread or process !'.format(kind))
+    if kind=='thread':
+        pool = ThreadPoolExecutor
+    else:
+        from concurrent.futures import ProcessPoolExecutor as pool #<--- imported on first use (loads multiprocessing)
+    def stream():
+        with pool(workers) as ex:
+            jobs = { ex.submit(_call, fn, *args): key for key, fn, args in calls }
+            for job in as_completed(jobs):
+                yield (jobs[job],) + _result(job)
+    if not ordered: return stream()
+    with pool(workers) as ex:
+        jobs = [ (key, ex.submit(_call, fn, *args)) for key, fn, args in calls ]
+    return [ (key,) + _result(job) for key, job in jobs ]
+
+
+#------------------------------------
+# LRU cache
+#------------------------------------
+class _LRU:
+    """ a LRU cache of values by key with a limit on no of entries and/or total size of entries (used by CFORAGE and iTOR)
+        an entry can be stamped (e.g. with mtime of its file) - it is used only if the same stamp is given to get()
+        counters of hits, misses and evictions are kept for the life of the cache
+    """
+    def __init__(self, entries=None, nbytes=None):
+        self.c, self.lock = OrderedDict(), Lock() #<--- { key : (value, size, stamp) }
+        self.limit, self.size, self.stats = (entries, nbytes), 0, [0, 0, 0] #<--- hits, misses, evictions
+    def info(self):
+        """ returns a dict of counters """
+        hits, misses, evictions = self.stats
+        return { 'hits': hits, 'misses': misses, 'evictions': evictions, 'entries': len(self.c), 'bytes': self.size,
+                 'hit_rate': hits/(hits + misses) if (hits + misses) else 0.0 }
+    def get(self, key, stamp=None):
+        """ returns the entry (value, size, stamp) of key or None if it is not cached (or has a different stamp) """
+        with self.lock:
+            x = self.c.get(key, None)
+            if x is None or x[2]!=stamp:
+                self.stats[1] += 1
+                return None
+            self.c.move_to_end(key)
+            self.stats[0] += 1
+            return x
+    def put(self, key, value, size, stamp=None):
+        """ adds or replaces an entry, least recently used entries are evicted to stay within limits """
+        entries, nbytes = self.limit
+        with self.lock:
+            x = self.c.pop(key, None)
+            if x is not None: self.size -= x[1]
+            self.c[key] = (value, size, stamp)
+            self.size += size
+            while self.c and ((entries and len(self.c) > entries) or (nbytes and self.size > nbytes)):
+                _, (_, x, _) = self.c.popitem(last=False)
+                self.size -= x
+                self.stats[2] += 1
+    def clear(self):
+        """ removes all entries, counters are kept """
+        with self.lock:
+            self.c.clear()
+            self.size = 0
+    def drop(self, *keys):
+        """ removes entries of keys """
+        with self.lock:
+            for key in keys:
+                x = self.c.pop(key, None)
+                if x is not None: self.size -= x[1]
+
+
 #------------------------------------
 # Forage
 #------------------------------------
@@ -163,16 +433,19 @@ class FORAGE(STORAGE):
     def save(self, alias, file, data, ftype):
         r,a,p = self.paths(alias, file)
         ftype.save(p, data)
+        self._mnote(alias, file, a)
         return r, a, p
 
     def save_py(self, alias, file, data, ftype):
         p = self.path_py(alias, file)
         ftype.save(p, data)
+        self._mnote(alias, file)
         return p
 
     def save_abs(self, alias, file, data, ftype):
         a = self.path_abs(alias, file)
         ftype.save(a, data)
+        self._mnote(alias, file, a)
         return a
 
     def load(self, alias, file, ftype):
@@ -187,14 +460,27 @@ class FORAGE(STORAGE):
         a = self.path_abs(alias, file)
         return ftype.load(a), a
 
+    def save_many(self, alias, items, ftype, workers=None, kind='thread', ordered=True):
+        """ saves many files concurrently, items is a dict of 'file' v/s data 
+            returns (file, abs path, error) for each file (see _many for workers, kind and ordered) """
+        return self._mnotes(alias, _many([ (file, _save, (ftype.save, self.path_abs(alias, file), data)) for file, data in items.items() ], workers, kind, ordered), ordered)
+
+    def load_many(self, alias, files, ftype, workers=None, kind='thread', ordered=True):
+        """ loads many files concurrently, returns (file, data, error) for each file (see _many for workers, kind and ordered) """
+        return _many([ (file, ftype.load, (self.path_abs(alias, file),)) for file in files ], workers, kind, ordered)
+
 
 #------------------------------------
 # CTFORAGE
 #------------------------------------
 class CFORAGE(STORAGE):
+    """ uses a common ftype to save and load all files, see FORAGE 
+        an optional cache of loaded objects can be enabled using cache()
+    """
     def __init__(self, storage, ftype, auto_create=True, auto_load=True, auto_save=True):
         super().__init__(storage, auto_create, auto_load, auto_save)
         self.ftype=ftype
+        self.c = None #<--- cache of loaded objects (an _LRU), see cache()
 
     def create(root, storage, ftype, auto_load=True, auto_save=True):
         """
@@ -205,30 +491,91 @@ class CFORAGE(STORAGE):
 
     def save(self, alias, file, data):
         r,a,p = self.paths(alias, file)
-        self.ftype.save(p, data)
+        self._save(a, p, data)
+        self._mnote(alias, file, a)
         return r, a, p
 
     def save_py(self, alias, file, data):
         p = self.path_py(alias, file)
-        self.ftype.save(p, data)
+        self._save(self.path_abs(alias, file) if self.c is not None else None, p, data)
+        self._mnote(alias, file)
         return p
 
     def save_abs(self, alias, file, data):
         a = self.path_abs(alias, file)
-        self.ftype.save(a, data)
+        self._save(a, a, data)
+        self._mnote(alias, file, a)
         return a
 
     def load(self, alias, file):
         r,a,p = self.paths(alias, file)
-        return self.ftype.load(p), r, a, p
+        return self._load(a, p), r, a, p
 
     def load_py(self, alias, file):
         p = self.path_py(alias, file)
-        return self.ftype.load(p), p
+        return self._load(self.path_abs(alias, file) if self.c is not None else None, p), p
 
     def load_abs(self, alias, file):
         a = self.path_abs(alias, file)
-        return self.ftype.load(a), a
+        return self._load(a, a), a
+
+    def save_many(self, alias, items, workers=None, kind='thread', ordered=True):
+        """ saves many files concurrently, items is a dict of 'file' v/s data 
+            returns (file, abs path, error) for each file (see _many for workers, kind and ordered) 
+            Note: save_many and load_many do not use the cache, saved files are removed from it """
+        c = self.c
+        if c is not None: c.drop(*[ self.path_abs(alias, file) for file in items ])
+        return self._mnotes(alias, _many([ (file, _save, (self.ftype.save, self.path_abs(alias, file), data)) for file, data in items.items() ], workers, kind, ordered), ordered)
+
+    def load_many(self, alias, files, workers=None, kind='thread', ordered=True):
+        """ loads many files concurrently, returns (file, data, error) for each file (see _many for workers, kind and ordered) """
+        return _many([ (file, self.ftype.load, (self.path_abs(alias, file),)) for file in files ], workers, kind, ordered)
+
+
+    #------------------------------------
+    # cache 
+    #------------------------------------
+    #   a LRU cache of loaded objects by abs path, an entry is used only if mtime and size of file are unchanged
+    #   the size of an entry is taken as the size of its file, saves write through to the cache
+    #   files are not cached if they are not found at the path given to ftype (e.g. ftypes that add an extension)
+    #   Note: cached objects are shared by all loads, they should not be modified in place
+    def cache(self, entries=None, nbytes=None):
+        """ enables a cache of upto entries objects and/or nbytes bytes, disables it if both are None """
+        self.c = _LRU(entries, nbytes) if (entries or nbytes) else None
+        return self.cache_info()
+
+    def cache_info(self):
+        """ returns a dict of cache counters """
+        c = self.c
+        return None if c is None else c.info()
+
+    def _load(self, a, p):
+        """ loads from path p, a is the abs path of same file used as cache key """
+        c = self.c
+        if c is None: return self.ftype.load(p)
+        try:
+            st = os.stat(a)
+        except OSError: #<--- ftype does not use the file at this path (e.g. FIG), nothing to cache
+            c.drop(a)
+            return self.ftype.load(p)
+        stamp = (st.st_mtime_ns, st.st_size)
+        x = c.get(a, stamp)
+        if x is not None: return x[0]
+        data = self.ftype.load(p)
+        c.put(a, data, st.st_size, stamp)
+        return data
+
+    def _save(self, a, p, data):
+        """ saves to path p, a is the abs path of same file used as cache key """
+        self.ftype.save(p, data)
+        c = self.c
+        if c is None: return
+        try:
+            st = os.stat(a)
+        except OSError: #<--- ftype saved to another path (e.g. NP adds .npy), the file is saved but not cached
+            c.drop(a)
+            return
+        c.put(a, data, st.st_size, (st.st_mtime_ns, st.st_size))
 #-----------------------------------------------------------------------------------------------------
 # Foot-Note:
 """ NOTE:
@@ -1,7 +1,19 @@
 #-----------------------------------------------------------------------------------------------------
 # struct.py
 #-----------------------------------------------------------------------------------------------------
-import os
+import os, sys, re, json
+from heapq import merge
+from threading import Lock
+from collections import deque, OrderedDict
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+from itertools import accumulate
+from mmap import mmap, ACCESS_READ
+from array import array
+from struct import Struct
+from known.ds.storage import _LRU
+BIG_ENDIAN = (sys.byteorder=='big') #<--- index files are always little-endian
+HAS_PREAD = hasattr(os, 'pread') #<--- positional reads, not available on windows
 GLOBAL_CTRL_CHAR = {
 
     'SOH'   : 1,    # start of header
@@ -36,6 +48,129 @@ GLOBAL_CTRL_CHAR = {
 #-----------------------------------------------------------------------------------------------------
 
 
+#------------------------------------
+# splitting records (module level so that it can be used by other processes)
+#------------------------------------
+USC, RSC = chr(GLOBAL_CTRL_CHAR['US']), chr(GLOBAL_CTRL_CHAR['RS'])
+def _irows(buffer, a, n, offsets, dec=None):
+    """ splits a buffer holding n complete records into rows
+            buffer holds the data file from offset a upto (and including) the RS of the last record
+            offsets yields the index entries of each record - used only with typed units (dec = decoders by unit position) """
+    if not dec:
+        rows = str(buffer, 'utf-8').split(RSC) #<--- single decode for all records
+        if len(rows)!=n+1: raise Exception('! Data file does not match index !')
+        return [ x.split(USC)[:-1] for x in rows[:-1] ]
+    res = []
+    for e in offsets:
+        units = [ buffer[x-a:y-a-1] for x,y in zip(e, e[1:]) ]
+        res.append([ f(u) for f,u in zip(dec, units) ] + [ str(u, 'utf-8') for u in units[len(dec):] ])
+    return res
+def _iscan(path, ii, rr, fn, keep, plan=None, schema=None, edits=None):
+    """ reads a contiguous range of records with a single read and applies fn on each row 
+            ii = unit offsets of the records, rr = record starts in ii (with len(ii) at the end)
+            plan = block table for compressed data files (see ziTOR._plan), schema = unit types (see iTOR.UTYPES)
+            edits = { record : updated row or None if deleted } by position in this range
+            returns [fn(row), ...] or the rows for which fn(row) is true if keep=True """
+    a, b = ii[0], ii[-1] + 1
+    if plan is None:
+        with open(path, 'rb') as f:
+            f.seek(a)
+            buffer = f.read(b - a)
+    else:
+        buffer = _zread(path, a, b, *plan)
+    res, dec = [], [ iTOR.UTYPES[t][1] for t in (schema or []) ]
+    rows = _irows(buffer, a, len(rr)-1, (ii[rr[k]:rr[k+1]] for k in range(len(rr)-1)), dec)
+    if edits: rows = [ x for x in (edits.get(k, row) for k,row in enumerate(rows)) if x is not None ]
+    for row in rows:
+        if keep:
+            if fn(row): res.append(row)
+        else:
+            res.append(fn(row))
+    return res
+
+
+
+def _zcodec(codec):
+    """ returns (compress, decompress) functions for a stdlib codec - zlib or lzma """
+    if codec=='zlib':
+        import zlib
+        return zlib.compress, zlib.decompress
+    if codec=='lzma':
+        import lzma
+        return lzma.compress, lzma.decompress
+    raise Exception('! Unknown codec [{}] !'.format(codec))
+def _zread(path, a, b, codec, zu, zc):
+    """ reads the byte range a to b of record data from a block-compressed data file
+            zu, zc = uncompressed and compressed start offsets of the blocks that cover the range (with end offsets at the end) """
+    if b <= a: return b''
+    _, decompress = _zcodec(codec)
+    with open(path, 'rb') as f:
+        f.seek(zc[0])
+        buffer = f.read(zc[-1] - zc[0])
+    data = b''.join([ decompress(buffer[x-zc[0]:y-zc[0]]) for x,y in zip(zc, zc[1:]) ])
+    return data[a-zu[0]:b-zu[0]]
+
+
+#------------------------------------
+# paged array of index offsets
+#------------------------------------
+class _iPAGES:
+    """ a read-only array of offsets that is loaded from an index file in pages, on demand
+            parts = [(position in array, position in file, count), ...] - one for each index segment
+            upto maxp pages (of page offsets each) are held in memory, least recently used pages are dropped
+            appended items are held in memory (used for the open record) """
+    def __init__(self, path, parts, page, maxp):
+        self.f, self.parts, self.page, self.maxp = open(path, 'rb'), parts, page, maxp
+        self.at, self.n = [ x[0] for x in parts ], sum([ x[2] for x in parts ])
+        self.tail, self.pages, self.lock = array('Q'), OrderedDict(), Lock()
+    def __len__(self):
+        return self.n + len(self.tail)
+    def append(self, x):
+        self.tail.append(x)
+    def close(self):
+        self.f.close()
+        self.pages.clear()
+    def _pread(self, a, n):
+        if HAS_PREAD: return os.pread(self.f.fileno(), n, a)
+        with self.lock:
+            self.f.seek(a)
+            return self.f.read(n)
+    def _page(self, k):
+        with self.lock:
+            pg = self.pages.get(k, None)
+            if pg is not None:
+                self.pages.move_to_end(k)
+                return pg
+        pg, a, b = array('Q'), k*self.page, min((k+1)*self.page, self.n)
+        j = bisect_right(self.at, a) - 1
+        while a < b: #<--- a page can span segments
+            g, p, c = self.parts[j]
+            x = min(b, g + c)
+            pg.frombytes(self._pread(p + 8*(a-g), 8*(x-a)))
+            a, j = x, j + 1
+        if BIG_ENDIAN: pg.byteswap()
+        with self.lock:
+            self.pages[k] = pg
+            if len(self.pages) > self.maxp: self.pages.popitem(last=False)
+        return pg
+    def __getitem__(self, x):
+        n, P = self.n, self.page
+        if isinstance(x, slice):
+            a, b, step = x.indices(len(self))
+            if step!=1: return array('Q', [ self[k] for k in range(a, b, step) ])
+            res = array('Q')
+            while a < min(b, n):
+                k = a//P
+                e = min(b, (k+1)*P, n)
+                res.extend(self._page(k)[a-k*P : e-k*P])
+                a = e
+            if b > n: res.extend(self.tail[max(a, n)-n : b-n])
+            return res
+        if x < 0: x += len(self)
+        if x >= n: return self.tail[x-n]
+        if x < 0: raise IndexError('index out of range')
+        return self._page(x//P)[x%P]
+
 
 #------------------------------------
 # indexed table of records - iTOR data structure
@@ -46,95 +181,355 @@ class iTOR:
         its just a,         list of(    records of(     units   )))
         which basically,    list of(    list of(        strings )))
         an iTOR is represented using 2 files - data file and index file
+
+        the index is kept in memory as 2 flat arrays of unsigned 64-bit ints
+            self.i      unit offsets - for each record: [start, end of unit 0, end of unit 1, ...]
+            self.ir     record start table - position in self.i where each record starts
+        the last entry in self.ir always points to the currently open record
+
+        the index file is a signature followed by segments, each segment holds a batch of records
+        in write modes (w/a) new segments are appended on checkpoint() and close() - the index file is never rewritten
+        and the records that were already saved are not held in memory (self.i0, self.r0 are their counts)
+
+        rows can be deleted or updated in write modes without rewriting the list (see delete(), update() and compact())
+
+        an optional schema is a list of unit types (see UTYPES) by unit position, units after the schema are str
+        numeric units are stored as fixed-width binary, the schema is saved next to the index file as <index>.schema
+        since binary units may contain seperator bytes, typed units are always read using index offsets
     """
     #<< class variables
     GLOBAL_US =     GLOBAL_CTRL_CHAR['US']
     GLOBAL_RS =     GLOBAL_CTRL_CHAR['RS']
-    def create(path, index_ext='.index'):
-        return iTOR(path, os.path.join(os.path.dirname(path), os.path.basename(path) + index_ext) )
+    IMAGIC =        b'iTORidx\x01'          # binary index file signature
+    IHEAD =         Struct('<QQ')           # index segment header - (no of offsets, no of records)
+    IOFFSET =       Struct('<Q')            # a single offset
+    WBUF =          1<<22                   # write buffer size (bytes) - encoded rows are flushed in chunks of this size
+    RGAP =          1<<12                   # byte ranges that are less than this many bytes apart are merged into a single read
+    RCHUNK =        1<<24                   # generators read the data file in chunks of this size (bytes)
+    IPAGE =         1<<13                   # no of offsets in a page of a lazy index
+    IPAGES =        1<<8                    # no of pages of a lazy index held in memory (for each of self.i and self.ir)
+    UI8, UF8 =      Struct('<q'), Struct('<d')
+    UTYPES = {                              # unit type : (encoder, decoder)
+        'str' :     (lambda x: str(x).encode('utf-8'),  lambda d: str(d, 'utf-8')),
+        'bytes' :   (bytes,                             bytes),
+        'int64' :   (lambda x: iTOR.UI8.pack(int(x)),   lambda d: iTOR.UI8.unpack(d)[0]),
+        'float64' : (lambda x: iTOR.UF8.pack(float(x)), lambda d: iTOR.UF8.unpack(d)[0]),
+    }
+    def create(path, index_ext='.index', schema=None):
+        return iTOR(path, os.path.join(os.path.dirname(path), os.path.basename(path) + index_ext), schema)
 
 
     #<< dunder methods      ----------------------------------------------------------
-    def __init__(self, data_file_path, index_file_path) -> None:
+    def __init__(self, data_file_path, index_file_path, schema=None) -> None:
         #assert(index.lower.endswith('.npy'))
         self.path= data_file_path
         self.index = index_file_path
+        self._schema(schema) #<--- schema of an existing list takes priority
         self.US = bytes([int(self.GLOBAL_US)]) # unit seperator
         self.RS = bytes([int(self.GLOBAL_RS)]) # record seperator
         self.mode = '' #<-- is closed
+        self.k, self.klock = {}, Lock() #<--- loaded key indices
+        self.c = None #<--- cache of decoded rows (an _LRU), see cache()
+        self.x, self.u, self.xd = {}, None, False #<--- edited rows, see delete() and update()
     def __iter__(self):
         return self.iterR()
     def __len__(self):
         return self.len()
 
 
+    #<< index file methods  ----------------------------------------------------------
+    def _iparse(buffer):
+        """ parses a legacy text index - one line per record of space-seperated decimal offsets """
+        i, ir = array('Q'), array('Q')
+        for x in buffer.decode('utf-8').split('\n'):
+            if x:
+                ir.append(len(i))
+                i.extend([ int(y) for y in x.split(' ') ])
+        return i, ir
+    def _iread(buffer):
+        """ parses a binary index - a signature followed by segments of (header, offsets, record starts) 
+            a truncated segment at the end (partial write) is ignored """
+        i, ir = array('Q'), array('Q')
+        view, p, n = memoryview(buffer), len(iTOR.IMAGIC), len(buffer)
+        while p + iTOR.IHEAD.size <= n:
+            no, nr = iTOR.IHEAD.unpack_from(buffer, p)
+            q = p + iTOR.IHEAD.size + 8*no
+            if q + 8*nr > n: break #<--- partial segment
+            i.frombytes(view[p + iTOR.IHEAD.size : q])
+            ir.frombytes(view[q : q + 8*nr])
+            p = q + 8*nr
+        if BIG_ENDIAN:
+            i.byteswap()
+            ir.byteswap()
+        return i, ir
+    def _iwrite(f, i, ir):
+        """ writes one index segment to an open binary file """
+        f.write(iTOR.IHEAD.pack(len(i), len(ir)))
+        if BIG_ENDIAN:
+            i, ir = array('Q', i), array('Q', ir)
+            i.byteswap()
+            ir.byteswap()
+        i.tofile(f)
+        ir.tofile(f)
+    def convert(index):
+        """ converts a legacy text index file to binary format (in-place), returns False if already binary """
+        with open(index, 'rb') as f:
+            buffer = f.read()
+        if buffer.startswith(iTOR.IMAGIC): return False
+        i, ir = iTOR._iparse(buffer)
+        with open(index, 'wb') as f:
+            f.write(iTOR.IMAGIC)
+            iTOR._iwrite(f, i, ir)
+        return True
+
+
+    def _isegs(f):
+        """ yields (position, no of offsets, no of records) of every complete segment in an open binary index file """
+        p, n = len(iTOR.IMAGIC), f.seek(0, 2)
+        while p + iTOR.IHEAD.size <= n:
+            f.seek(p)
+            a, b = iTOR.IHEAD.unpack(f.read(iTOR.IHEAD.size))
+            if p + iTOR.IHEAD.size + 8*(a+b) > n: break #<--- partial segment
+            yield p, a, b
+            p += iTOR.IHEAD.size + 8*(a+b)
+    def _itail(self):
+        """ prepares the index file for appending without loading it - returns (no of offsets, no of records, last offset)
+            a legacy text index is converted and a partially written segment at the end is removed """
+        try:
+            with open(self.index, 'rb') as f:
+                if f.read(len(self.IMAGIC))!=self.IMAGIC: f.close(); iTOR.convert(self.index)
+        except FileNotFoundError:
+            with open(self.index, 'wb') as f:
+                f.write(self.IMAGIC)
+        no, nr, last = 0, 0, None
+        with open(self.index, 'r+b') as f:
+            end = len(self.IMAGIC)
+            for p, a, b in iTOR._isegs(f):
+                if a:
+                    f.seek(p + self.IHEAD.size + 8*(a-1))
+                    last, = self.IOFFSET.unpack(f.read(8))
+                no, nr, end = no+a, nr+b, p + self.IHEAD.size + 8*(a+b)
+            if end < f.seek(0, 2): f.truncate(end)
+        return no, nr, last
+    def _isave(self, sync=False):
+        """ appends the closed records held in memory to the index file as a new segment, then drops them from memory """
+        k = self.ir[-1]
+        if len(self.ir)>1:
+            ir = array('Q', [ x + self.i0 for x in self.ir[:-1] ]) if self.i0 else self.ir[:-1]
+            with open(self.index, 'ab') as f:
+                iTOR._iwrite(f, self.i[:k], ir)
+                if sync: 
+                    f.flush()
+                    os.fsync(f.fileno())
+            self.i0, self.r0 = self.i0 + k, self.r0 + len(ir)
+            del self.i[:k]
+            self.ir = array('Q', [0])
+
+
+    #<< schema methods  ----------------------------------------------------------
+    def _schema(self, schema):
+        if schema:
+            for t in schema:
+                if t not in self.UTYPES: raise Exception('! Unknown unit type [{}] !'.format(t))
+        self.schema = list(schema) if schema else None
+        self.enc = [ self.UTYPES[t][0] for t in schema ] if schema else []
+        self.dec = [ self.UTYPES[t][1] for t in schema ] if schema else []
+    def _sopen(self, mode):
+        """ saves the schema (w mode) or loads the schema of an existing list """
+        path = self.index + '.schema'
+        if mode=='w':
+            if self.schema:
+                with open(path, 'w') as f: 
+                    f.write(json.dumps(self.schema))
+            elif os.path.exists(path): 
+                os.remove(path)
+        elif os.path.exists(path):
+            with open(path, 'r') as f: 
+                self._schema(json.loads(f.read()))
+    def _udecode(self, k, d):
+        return self.dec[k](d) if k < len(self.dec) else str(d, 'utf-8')
+    def _uround(self, k, unit):
+        """ returns a unit at position k as it would be read back after writing it """
+        return self._udecode(k, self.enc[k](unit) if k < len(self.enc) else str(unit).encode('utf-8'))
+    def _decode(self, units):
+        return [ f(u) for f,u in zip(self.dec, units) ] + [ str(u, 'utf-8') for u in units[len(self.dec):] ]
+
+
     #<< open method
     def _iopen(self):
-        with open(self.index, 'rt', encoding='utf-8', newline='\n') as f:
-            res = [ ([ int(y) for y in x[0:-1].split(' ')]  if len(x)>1 else [])  for x in f.readlines() ]
-        return res
-    def _openi(self):
-        if self.mode!='w':
+        with open(self.index, 'rb') as f:
+            buffer = f.read() #<--- single bulk read
+        return iTOR._iread(buffer) if buffer.startswith(self.IMAGIC) else iTOR._iparse(buffer)
+    def _ilazy(self):
+        """ returns paged arrays (self.i, self.ir) - only the segment headers are read """
+        with open(self.index, 'rb') as f:
+            if f.read(len(self.IMAGIC))!=self.IMAGIC: return None #<--- legacy text index
+            pi, pr, gi, gr = [], [], 0, 0
+            for p, no, nr in iTOR._isegs(f):
+                if no: pi.append((gi, p + self.IHEAD.size, no))
+                if nr: pr.append((gr, p + self.IHEAD.size + 8*no, nr))
+                gi, gr = gi + no, gr + nr
+        return _iPAGES(self.index, pi, self.IPAGE, self.IPAGES), _iPAGES(self.index, pr, self.IPAGE, self.IPAGES)
+    def _openi(self, tail=None, lazy=False):
+        self.i0, self.r0 = 0, 0 #<--- no of offsets and records saved in index file but not held in memory
+        if self.mode=='w':
+            with open(self.index, 'wb') as f:
+                f.write(self.IMAGIC)
+            self._kreset()
+            self._cclear()
+            self.i, self.ir, s = array('Q'), array('Q'), 0
+        elif self.mode=='a':
+            self.i0, self.r0, last = tail
+            self.i, self.ir, s = array('Q'), array('Q'), (0 if last is None else last+1)
+        else:
             try:
-                i = self._iopen()
-                self.i = i if i else []
+                x = self._ilazy() if lazy else None
+                self.i, self.ir = self._iopen() if x is None else x
             except FileNotFoundError:
-                self.i = []
-        else:
-            self.i = []
-        self.i.append([(self.i[-1][-1]+1) if self.i else 0])
-    def open(self, mode='w'): 
-        """ opens the list for appending, mode should be either w/a """
+                self.i, self.ir = array('Q'), array('Q')
+            s = (self.i[-1]+1) if len(self.i) else 0
+        self.ir.append(len(self.i))
+        self.i.append(s)
+    def _mopen(self):
+        self.f = open(self.path, mode='rb')
+        self.m = mmap(self.f.fileno(), 0, access=ACCESS_READ) if os.fstat(self.f.fileno()).st_size else b''
+        self.v = memoryview(self.m)
+    def open(self, mode='w', lazy=False): 
+        """ opens the list for appending, mode should be either w/a 
+            use mode r to read from file and mode m to read from a memory-mapped file
+            use mode p for a read-only handle that can be shared across threads (uses positional reads) 
+            lazy=True (read modes only) loads the index in pages when needed instead of loading it all at once
+                memory used by the index is limited to about 2*IPAGES*IPAGE*8 bytes """
         if not self.mode:
+            self._swap() #<--- an interrupted compact() is finished first
+            tail = None
+            if mode=='a':
+                tail = self._itail()
+                s, n = (0 if tail[-1] is None else tail[-1]+1), self._dsize()
+                if s!=n:
+                    raise Exception('! Data file size [{}] does not match index [{}] - use recover() first !'.format(n, s))
+            self._sopen(mode)
+            self._xopen(mode)
+            self._cclear() #<--- the files may have been changed by others while closed (counters are kept)
             self.mode=mode
-            self.f = open(self.path, mode=self.mode+'b')
-            self._openi()
+            if mode=='m':
+                self._mopen()
+            else:
+                self.f = open(self.path, mode=('r' if mode=='p' else mode)+'b')
+                if mode in ('w', 'a'): self._wopen()
+                if mode=='p': self.lock = None if HAS_PREAD else Lock()
+            self._openi(tail, lazy and mode in ('r', 'm', 'p'))
         else:
             print('! Already open in [{}] mode !'.format(self.mode))
 
 
     #<< close method        ----------------------------------------------------------
     def _iclose(self):
-        with open(self.index, 'wt', encoding='utf-8', newline='\n') as f:
-            for i in self.i:
-                f.write( ' '.join([ str(d) for d in i ]) + '\n' )
-            del self.i
+        if self.mode in ('w', 'a'): self._isave() #<--- index is unchanged in read modes (r/m/p)
+        for x in (self.i, self.ir):
+            if isinstance(x, _iPAGES): x.close()
+        del self.i, self.ir, self.i0, self.r0
         return self.index
     def _closei(self):
         #assert(not self.i.pop()) #<----- means that some row might be open.... close it?
-        lR = self.i.pop()
+        lR = self.i[self.ir[-1]:]
         if len(lR)>1:
-            print('! Last Record was not closed - ignoring data: [{}] !'.format(lR))
+            print('! Last Record was not closed - ignoring data: [{}] !'.format(lR.tolist()))
         self._iclose()
+    def _mclose(self):
+        self.v.release()
+        try:
+            if self.m: self.m.close()
+        except BufferError: pass #<--- raw views are still held by caller, map is freed along with them
+        del self.v, self.m
     def close(self):
         """ closes the list, should be called to free resources """
         if self.mode:
+            if self.mode=='m': self._mclose()
+            if self.mode in ('w', 'a'): self._wclose()
             self.f.close()
             self._closei()
+            self._xclose()
+            self.k.clear()
             self.mode=''
         else:
             print('! Already closed !')
 
 
     #<< write method        ----------------------------------------------------------
+    #   encoded units are collected in a buffer (self.b) and written out in large chunks
+    #   offsets are computed from the encoded lengths (self.p is the logical end of file)
+    def _dsize(self):
+        """ no of bytes of record data in the data file """
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+    def _wopen(self):
+        self.b, self.p = bytearray(), self._dsize()
+    def _wflush(self):
+        if self.b:
+            self.f.write(self.b)
+            self.b.clear()
+    def _wclose(self):
+        self._wflush()
+        del self.b, self.p
+    def flush(self, sync=False):
+        """ writes out buffered data, sync=True also forces it to disk """
+        self._wflush()
+        self.f.flush()
+        if sync: os.fsync(self.f.fileno())
+    def checkpoint(self, sync=False):
+        """ writes out buffered data and appends the index entries of all closed records to the index file
+                records written before a checkpoint are readable even if the process dies before close()
+                sync=True also forces both files to disk """
+        if self.mode not in ('w', 'a'):
+            raise Exception('! Not open for writing - mode is [{}] !'.format(self.mode))
+        self.flush(sync) #<--- data must reach the file before the index that points into it
+        self._isave(sync)
+        if self.xd: self._xsave(sync)
     def _uwrite(self, *units):
+        b, i, p, US, enc = self.b, self.i, self.p, self.US, self.enc
+        k = len(i) - self.ir[-1] - 1 #<--- no of units already in the open record
+        units = [ (enc[j](unit) if j < len(enc) else str(unit).encode('utf-8')) for j, unit in enumerate(units, k) ] #<--- encode all first
         for unit in units:
-            self.f.write(str(unit).encode('utf-8'))
-            self.f.write(self.US)
-            self.i[-1].append( self.f.tell() )
+            b += unit
+            b += US
+            p += len(unit) + 1
+            i.append(p)
+        self.p = p
+        if len(b) >= self.WBUF: self._wflush()
     def _uclose(self):
-        self.f.write(self.RS)
-        self.i.append([self.f.tell()])
+        self.b += self.RS
+        self.p += 1
+        self.ir.append(len(self.i))
+        self.i.append(self.p)
     def write(self, *rows): # rows are records
         """ args = multiple rows, writes multiple rows at once
                 assumes that each item in args is a row itself - row should be iterable """
-        for row in rows:
-            self.writeR(*row)
+        b, i, ir, p, US, RS, WBUF, enc = self.b, self.i, self.ir, self.p, self.US, self.RS, self.WBUF, self.enc
+        u0 = len(i) - ir[-1] - 1 #<--- the first row continues a record that can already have units (from writeU)
+        try:
+            for row in rows:
+                #<--- a row is encoded fully before any of it is buffered, so a bad row leaves nothing behind
+                if enc:
+                    row = [ (enc[k](unit) if k < len(enc) else str(unit).encode('utf-8')) for k, unit in enumerate(row, u0) ]
+                    u0 = 0
+                else:
+                    row = [ str(unit).encode('utf-8') for unit in row ]
+                for unit in row:
+                    b += unit
+                    b += US
+                    p += len(unit) + 1
+                    i.append(p)
+                b += RS
+                p += 1
+                ir.append(len(i))
+                i.append(p)
+                if len(b) >= WBUF: self._wflush()
+        finally:
+            self.p = p #<--- rows written before a failed row are kept
     def writeR(self, *units):
         """ args = multiple units in a row, writes one full row at once
                 assumes that each item in arg is a item(unit) in this row """
-        self._uwrite(*units)
-        self._uclose()
+        self.write(units)
     def writeU(self, *units, close=False):
         """ args = multiple cells in a row, 
                 assumes that each item in arg is a item(cell) in this row """
@@ -143,85 +538,562 @@ class iTOR:
         
 
     #<< read method     ----------------------------------------------------------
-    def readU(self, row, unit):
-        a, b = self.i[row][unit], self.i[row][unit+1]
-        self.f.seek(a)
-        return self.f.read(b - a - 1).decode('utf-8')
-    def readR(self, row):
-        a, b = self.i[row][0], self.i[row][-1]
+    def _read(self, a, n):
+        """ reads n bytes starting at a, does not depend on the file position in p mode """
+        if self.mode=='p':
+            if HAS_PREAD: return os.pread(self.f.fileno(), n, a)
+            with self.lock:
+                self.f.seek(a)
+                return self.f.read(n)
         self.f.seek(a)
-        return [ d.decode('utf-8') for d in self.f.read(b - a - 1).split(self.US) ]
-    def read(self, *rows):
-        return [ self.readR(row) for row in rows ]
-    def readA(self):
-        return self.read(*range(len(self)))
+        return self.f.read(n)
+    def readU(self, row, unit, raw=False):
+        """ reads a unit from a row, raw=True returns undecoded bytes (a memoryview in m mode) """
+        if self.x and row in self.x: 
+            return None if self.x[row] < 0 else self.u.readU(self.x[row], unit, raw)
+        a = self.ir[row] + unit
+        a, b = self.i[a], self.i[a+1] - 1
+        d = self.v[a:b] if self.mode=='m' else self._read(a, b - a)
+        return d if raw else self._udecode(unit, d)
+    def readR(self, row, raw=False):
+        """ reads all units of a row, raw=True returns undecoded bytes (memoryviews in m mode) """
+        if self.x and row in self.x: return self._xread(row, raw)
+        if self.c is None or raw: return self._readR(row, raw)
+        res = self._cget(row)
+        if res is None:
+            res = self._readR(row, raw)
+            self._cput(row, res)
+        return res
+    def _readR(self, row, raw):
+        a, b = self.i[self.ir[row]], self.i[self.ir[row+1]-1]
+        if a==b: return [] #<--- record without units
+        if self.schema:
+            e = self.i[self.ir[row]:self.ir[row+1]]
+            d, base = (self.v, 0) if self.mode=='m' else (self._read(a, b - a - 1), a)
+            d = [ d[x-base:y-base-1] for x,y in zip(e, e[1:]) ]
+            return d if raw else self._decode(d)
+        if self.mode=='m':
+            if raw:
+                ii = self.i[self.ir[row]:self.ir[row+1]]
+                return [ self.v[x:y-1] for x,y in zip(ii, ii[1:]) ] #<--- zero-copy slices
+            return str(self.v[a:b-1], 'utf-8').split(self.US.decode())
+        d = self._read(a, b - a - 1).split(self.US)
+        return d if raw else [ x.decode('utf-8') for x in d ]
+    def _readS(self, spans, gap=None):
+        """ reads many byte ranges [(a, b), ...] and returns their data in the same order
+                ranges are sorted by offset and the ones that are less than gap bytes apart are read at once
+                (a single read is not extended beyond WBUF bytes) """
+        if self.mode=='m': return [ self.v[a:b] for a,b in spans ]
+        gap = self.RGAP if gap is None else gap
+        res, order = [None for _ in spans], sorted(range(len(spans)), key=spans.__getitem__)
+        k, n = 0, len(order)
+        while k < n:
+            a, b = spans[order[k]]
+            j = k + 1
+            while j < n and spans[order[j]][0] - b <= gap and spans[order[j]][1] - a <= self.WBUF:
+                b = max(b, spans[order[j]][1])
+                j += 1
+            buffer = memoryview(self._read(a, b - a))
+            for x in order[k:j]:
+                res[x] = buffer[spans[x][0]-a : spans[x][1]-a]
+            k = j
+        return res
+    def readC(self, unit, rows=None, gap=None, dtype=None):
+        """ reads one unit (column) from many rows (all rows by default) without reading other units
+                nearby byte ranges are merged into single reads, rows that do not have this unit give None
+                dtype (like 'int64' or 'float64') returns a numpy array instead of a list """
+        rows = range(self.len()) if rows is None else rows
+        if self.x and any(r in self.x for r in rows):
+            col = self.readC(unit, [ r for r in rows if r not in self.x ], gap)
+            col.reverse()
+            col = [ (self._xunit(r, unit) if r in self.x else col.pop()) for r in rows ]
+            if dtype is None: return col
+            import numpy #<--- optional dependency
+            return numpy.array(col, dtype=dtype)
+        spans, where = [], []
+        for k,r in enumerate(rows):
+            p = self.ir[r] + unit
+            if p + 1 < self.ir[r+1]:
+                spans.append((self.i[p], self.i[p+1]-1))
+                where.append(k)
+        t = self.schema[unit] if (self.schema and unit < len(self.schema)) else 'str'
+        data = self._readS(spans, gap) if spans else []
+        if t in ('int64', 'float64'):
+            data = b''.join(data) #<--- fixed-width values are decoded in bulk
+            if dtype is not None and len(where)==len(rows):
+                import numpy #<--- optional dependency
+                return numpy.frombuffer(data, dtype='<i8' if t=='int64' else '<f8').astype(dtype)
+            data = array('q' if t=='int64' else 'd', data)
+            if BIG_ENDIAN: data.byteswap()
+            data = data.tolist()
+        elif t=='bytes':
+            data = [ bytes(d) for d in data ]
+        else:
+            data = self.US.join(data).decode('utf-8').split(self.US.decode()) if data else [] #<--- bulk decode
+        if len(where)==len(rows):
+            col = data
+        else:
+            col = [ None for _ in rows ]
+            for k,d in zip(where, data): col[k] = d
+        if dtype is None: return col
+        import numpy #<--- optional dependency
+        return numpy.array(col, dtype=dtype)
+    def read(self, *rows, raw=False, gap=None):
+        """ reads many rows at once, returns them in the same order as rows
+                rows are sorted by offset and the ones that are less than gap bytes apart are read together (see _readS) """
+        if self.x and any(r in self.x for r in rows):
+            res = self.read(*[ r for r in rows if r not in self.x ], raw=raw, gap=gap)
+            res.reverse()
+            return [ (self._xread(r, raw) if r in self.x else res.pop()) for r in rows ]
+        if self.c is None or raw: return self._readM(rows, raw, gap)
+        res = [ self._cget(r) for r in rows ]
+        miss = [ k for k, x in enumerate(res) if x is None ]
+        if miss:
+            for k, x in zip(miss, self._readM([ rows[k] for k in miss ], raw, gap)):
+                res[k] = x
+                self._cput(rows[k], x)
+        return res
+    def _readM(self, rows, raw, gap):
+        i, ir, spans = self.i, self.ir, []
+        for r in rows:
+            a, b = i[ir[r]], i[ir[r+1]-1]
+            spans.append((a, max(a, b-1)))
+        res = []
+        for r, (a, _), d in zip(rows, spans, self._readS(spans, gap)):
+            e = i[ir[r]:ir[r+1]]
+            if len(e)==1:
+                res.append([]) #<--- record without units
+            elif raw or self.schema:
+                d = [ d[x-a:y-a-1] for x,y in zip(e, e[1:]) ]
+                if self.mode!='m': d = [ bytes(x) for x in d ]
+                res.append(d if raw else self._decode(d))
+            else:
+                res.append(str(d, 'utf-8').split(USC))
+        return res
+    def readA(self, raw=False):
+        """ reads all rows except the deleted ones """
+        return self.read(*[ r for r in range(len(self)) if self.x.get(r, 0) >= 0 ], raw=raw)
     
 
+    #<< cache method    ----------------------------------------------------------
+    #   an optional LRU cache of decoded rows used by readR() and read() (not with raw=True)
+    #   the cache is emptied whenever the list is opened
+    #   the size of a row is taken as the no of bytes it takes in the data file
+    def cache(self, entries=None, nbytes=None):
+        """ enables a cache of upto entries rows and/or nbytes bytes, disables it if both are None """
+        self.c = _LRU(entries, nbytes) if (entries or nbytes) else None
+        return self.cache_info()
+    def cache_info(self):
+        """ returns a dict of cache counters """
+        c = self.c
+        return None if c is None else c.info()
+    def _cclear(self, *rows):
+        """ removes rows from cache (all rows if none given) """
+        c = self.c
+        if c is None: return
+        if rows: c.drop(*rows)
+        else: c.clear()
+    def _cget(self, row):
+        x = self.c.get(row)
+        return None if x is None else list(x[0]) #<--- a copy, so that callers can not modify the cached row
+    def _cput(self, row, res):
+        self.c.put(row, list(res), self.i[self.ir[row+1]] - self.i[self.ir[row]])
+
+
     #<< generator method ----------------------------------------------------------
-    def iterU(self):
+    #   the data file is read in chunks of (about) RCHUNK bytes, a chunk always ends at a record boundary
+    #   in p mode, the generators use positional reads and leave the shared handle open
+    def _iterC(self, chunk=None):
+        """ generator - yields a list of rows for every chunk """
         if not self.mode:
             self.open('r')
         else:
-            if self.mode!='r':
+            if self.mode not in ('r', 'm', 'p'):
                 raise Exception('! Already open in [{}] mode - close it first!'.format(self.mode))
-        ptr = 0
-        self.f.seek(ptr)
-        temp= self.i.pop()
-        for ii in self.i:
-            assert(ptr==ii[0]) #<---- indicates errors in file
-            for index in ii[1:]:
-                i =  index - ptr - 1
-                buffer = self.f.read(i)
-                _ = self.f.read(1)
-                ptr += (i +1)
-                yield buffer.decode('utf-8')
-            _ = self.f.read(1)
-            ptr += 1
-            yield None #<--- None to mark end of row
-        del ptr #<-- clean up
-        self.i.append(temp)
-        self.close()
-    def iterR(self):
-        if not self.mode:
+        chunk = chunk or self.RCHUNK
+        i, ir, n, r = self.i, self.ir, self.len(), 0
+        while r < n:
+            a, lo, hi = i[ir[r]], r + 1, n #<--- find the last record that ends within chunk (at least one record)
+            while lo < hi:
+                m = (lo + hi + 1)//2
+                if i[ir[m]] - a <= chunk: 
+                    lo = m
+                else:
+                    hi = m - 1
+            b = i[ir[lo]]
+            buffer = self.v[a:b] if self.mode=='m' else self._read(a, b - a)
+            rows = _irows(buffer, a, lo - r, (i[ir[k]:ir[k+1]] for k in range(r, lo)), self.dec)
+            yield self._xpatch(r, rows) if self.x else rows
+            r = lo
+        if self.mode!='p': self.close()
+    def iterU(self, chunk=None):
+        for rows in self._iterC(chunk):
+            for row in rows:
+                yield from row
+                yield None #<--- None to mark end of row
+    def iterR(self, chunk=None):
+        for rows in self._iterC(chunk):
+            yield from rows
+    def iter_batches(self, n, chunk=None):
+        """ generator - yields lists of n rows (the last list can be shorter) """
+        batch = []
+        for rows in self._iterC(chunk):
+            k = 0
+            while k < len(rows):
+                take = rows[k:k + n - len(batch)]
+                batch.extend(take)
+                k += len(take)
+                if len(batch)==n:
+                    yield batch
+                    batch = []
+        if batch: yield batch
+
+
+    #<< parallel method ----------------------------------------------------------
+    def _parallel(self, fn, keep, workers, chunk_rows, ordered):
+        opened = not self.mode
+        if opened: 
             self.open('r')
-        else:
-            if self.mode!='r':
-                raise Exception('! Already open in [{}] mode - close it first!'.format(self.mode))
-        ptr = 0
-        self.f.seek(ptr)
-        temp= self.i.pop()
-        for ii in self.i:
-            assert(ptr==ii[0]) #<---- indicates errors in file
-            row = []
-            for index in ii[1:]:
-                i =  index - ptr - 1
-                buffer = self.f.read(i)
-                _ = self.f.read(1)
-                ptr += (i +1)
-                row.append(buffer.decode('utf-8'))
-            _ = self.f.read(1)
-            ptr += 1
-            yield row #<--- None to mark end of row
-        del ptr #<-- clean up
-        self.i.append(temp)
-        self.close()
+        elif self.mode not in ('r', 'm', 'p'):
+            raise Exception('! Already open in [{}] mode - close it first!'.format(self.mode))
+        try:
+            n, window = self.len(), 2*(workers or os.cpu_count() or 1) #<--- no of chunks in flight
+            jobs = deque() if ordered else set()
+            from concurrent.futures import ProcessPoolExecutor #<--- imported on first use (loads multiprocessing)
+            with ProcessPoolExecutor(workers) as ex:
+                for r in list(range(0, n, chunk_rows)) + [None]:
+                    if r is not None:
+                        q = min(r + chunk_rows, n)
+                        ii = self.i[self.ir[r]:self.ir[q]]
+                        edits = { k - r : self._xread(k, False) for k in range(r, q) if k in self.x } if self.x else None
+                        job = ex.submit(_iscan, self.path, ii, array('Q', [ x - self.ir[r] for x in self.ir[r:q+1] ]), 
+                                        fn, keep, self._plan(ii[0], ii[-1]+1), self.schema, edits)
+                        jobs.append(job) if ordered else jobs.add(job)
+                    while jobs and (r is None or len(jobs)>=window):
+                        if ordered:
+                            done = (jobs.popleft(),)
+                        else:
+                            done, jobs = wait(jobs, return_when=FIRST_COMPLETED)
+                        for job in done:
+                            yield from job.result()
+        finally:
+            if opened: self.close()
+    def _plan(self, a, b):
+        """ extra information needed by a worker process to read the byte range a to b - None for plain data files """
+        return None
+    def parallel_map(self, fn, workers=None, chunk_rows=10000, ordered=True):
+        """ generator - applies fn on every row using a pool of processes and yields the results
+                the table is split into chunks of chunk_rows rows and each worker reads its chunk as one byte range
+                results are yielded in row order if ordered=True, otherwise in the order that chunks finish
+                fn should be picklable (e.g. a module level function) """
+        return self._parallel(fn, False, workers, chunk_rows, ordered)
+    def parallel_filter(self, fn, workers=None, chunk_rows=10000, ordered=True):
+        """ generator - same as parallel_map but yields the rows for which fn(row) is true """
+        return self._parallel(fn, True, workers, chunk_rows, ordered)
+
+
+    #<< key method      ----------------------------------------------------------
+    #   a key index maps the values of one unit position (col) to row numbers, it can be of 2 kinds
+    #       hash    for equality lookups - find()
+    #       sorted  for equality, range and prefix lookups - find(), range(), prefix()
+    #   it is saved next to the index file as <index>.<col>.<kind> along with the no of rows it covers
+    #   and whenever it is used, it is brought up to date by reading the new rows only
+    #   the key indices of a list are listed in <index>.keys, edited rows are patched in them by checkpoint() and close()
+    KCAST = { 'str': str, 'int': int, 'float': float }
+    def _kpath(self, col, kind):
+        return '{}.{}.{}'.format(self.index, col, kind)
+    def _klist(self):
+        """ returns the (col, kind) of all key indices of this list """
+        path = self.index + '.keys'
+        if not os.path.exists(path): return []
+        with open(path, 'r') as f:
+            return [ tuple(x) for x in json.loads(f.read()) ]
+    def _ksave(self, path, k):
+        with open(path + '.tmp', 'w') as f:
+            f.write(json.dumps({ 'n': k['n'], 'cast': k['cast'], 'keys': k['keys'], 'rows': k['rows'] }, separators=(',', ':')))
+        os.replace(path + '.tmp', path)
+    def _kreset(self):
+        """ empties all key indices of this list (when it is rewritten in w mode) """
+        for col, kind in self._klist():
+            path = self._kpath(col, kind)
+            if not os.path.exists(path): continue
+            with open(path, 'r') as f:
+                cast = json.loads(f.read())['cast']
+            self._ksave(path, { 'n': 0, 'cast': cast, 'keys': [], 'rows': [] })
+    def _kpatch(self):
+        """ replaces the entries of rows edited since the last save (self.xk) in all key indices of this list
+                rows that a key index does not cover yet are left to be read when it is brought up to date """
+        for col, kind in self._klist():
+            path = self._kpath(col, kind)
+            if not os.path.exists(path): continue
+            with open(path, 'r') as f:
+                k = json.loads(f.read())
+            edited = { r: units for r, units in self.xk.items() if r < k['n'] }
+            if not edited: continue
+            try:
+                cast = self.KCAST[k['cast']]
+                new = sorted([ (cast(self._uround(col, units[col])), r) for r, units in edited.items() if units is not None and col < len(units) ])
+            except ValueError: #<--- rebuilt on next use (where the error is raised)
+                k['n'], k['keys'], k['rows'], new = 0, [], [], None
+            if new is not None:
+                kept = [ (v, r) for v, r in zip(k['keys'], k['rows']) if r not in edited ]
+                if kind=='hash': kept = list(merge(kept, sorted(new, key=lambda x: x[1]), key=lambda x: x[1])) #<--- hash keys are in row order
+                else: kept = list(merge(kept, new))
+                k['keys'], k['rows'] = [ v for v,_ in kept ], [ r for _,r in kept ]
+            self._ksave(path, k)
+    def _key(self, col, kind):
+        """ returns an up to date key index or None if it does not exist """
+        if self.mode not in ('r', 'm', 'p'):
+            raise Exception('! Key indices need a read mode (r/m/p), current mode is [{}] !'.format(self.mode))
+        with self.klock:
+            path, k = self._kpath(col, kind), self.k.get((col, kind), None)
+            if k is None:
+                if not os.path.exists(path): return None
+                with open(path, 'r') as f:
+                    k = json.loads(f.read())
+                if kind=='hash':
+                    k['map'] = {}
+                    for v, r in zip(k['keys'], k['rows']): k['map'].setdefault(v, []).append(r)
+                self.k[(col, kind)] = k
+            n = self.len()
+            if k['n'] < n:
+                cast, rows = self.KCAST[k['cast']], range(k['n'], n)
+                new = [ (cast(v), r) for v, r in zip(self.readC(col, rows), rows) if v is not None ]
+                if kind=='hash':
+                    for v, r in new:
+                        k['map'].setdefault(v, []).append(r)
+                        k['keys'].append(v)
+                        k['rows'].append(r)
+                else:
+                    new = list(merge(zip(k['keys'], k['rows']), sorted(new)))
+                    k['keys'], k['rows'] = [ v for v,_ in new ], [ r for _,r in new ]
+                k['n'] = n
+                self._ksave(path, k)
+            return k
+    def key(self, col, kind='hash', cast='str'):
+        """ creates (or updates) a key index on unit position col, should be open in a read mode (r/m/p)
+                kind = hash or sorted, cast = str, int or float (values are converted before indexing)
+                returns the no of rows that are indexed """
+        path = self._kpath(col, kind)
+        if not os.path.exists(path): self._ksave(path, { 'n': 0, 'cast': cast, 'keys': [], 'rows': [] })
+        keys = self._klist()
+        if (col, kind) not in keys:
+            with open(self.index + '.keys.tmp', 'w') as f:
+                f.write(json.dumps(keys + [(col, kind)]))
+            os.replace(self.index + '.keys.tmp', self.index + '.keys')
+        return len(self._key(col, kind)['rows'])
+    def find(self, col, value):
+        """ returns the rows where unit col equals value - uses a hash key index if available, otherwise a sorted one """
+        k = self._key(col, 'hash')
+        if k is not None: 
+            return list(k['map'].get(self.KCAST[k['cast']](value), []))
+        k = self._key(col, 'sorted')
+        if k is None: raise Exception('! No key index on [{}] - create one using key() !'.format(col))
+        value = self.KCAST[k['cast']](value)
+        return k['rows'][bisect_left(k['keys'], value):bisect_right(k['keys'], value)]
+    def range(self, col, lo=None, hi=None):
+        """ returns the rows where lo <= unit col < hi (in order of values) - needs a sorted key index """
+        k = self._key(col, 'sorted')
+        if k is None: raise Exception('! No sorted key index on [{}] - create one using key() !'.format(col))
+        cast = self.KCAST[k['cast']]
+        a = 0 if lo is None else bisect_left(k['keys'], cast(lo))
+        b = len(k['keys']) if hi is None else bisect_left(k['keys'], cast(hi))
+        return k['rows'][a:b]
+    def prefix(self, col, prefix):
+        """ returns the rows where unit col starts with prefix (in order of values) - needs a sorted key index of str """
+        return self.range(col, prefix, prefix + chr(0x10ffff))
+
+
+    #<< edit method     ----------------------------------------------------------
+    #   deleted and updated rows keep their row numbers, their old records are left in the data file
+    #       self.x      edited rows - { row : position of the updated record in the side list or -1 if deleted }
+    #       self.u      side list of updated records - an iTOR at <data>.upd, <index>.upd
+    #   the edits are saved next to the index file as <index>.edits on checkpoint() and close()
+    #   deleted rows read as None and are skipped by readA(), generators and parallel methods
+    #   compact() rewrites the list without deleted rows and with updated rows in place
+    def _xpath(self):
+        return self.index + '.edits'
+    def _xside(self):
+        return iTOR(self.path + '.upd', self.index + '.upd', self.schema)
+    def _xdrop(self):
+        """ removes all edits of this list """
+        u = self._xside()
+        for x in (self._xpath(), u.path, u.index, u.index + '.schema'):
+            if os.path.exists(x): os.remove(x)
+    def _xopen(self, mode):
+        self.x, self.u, self.xd, self.xk = {}, None, False, {} #<--- xk holds units of rows edited since the last save (None if deleted)
+        if mode=='w': 
+            self._xdrop()
+        elif os.path.exists(self._xpath()):
+            with open(self._xpath(), 'r') as f:
+                e = json.loads(f.read())
+            self.x = dict(zip(e['rows'], e['at']))
+            if mode!='a' and os.path.exists(self._xside().index):
+                self.u = self._xside()
+                self.u.open(mode)
+    def _xsave(self, sync=False):
+        if self.u is not None: self.u.checkpoint(sync) #<--- updated records are saved before the edits that point to them
+        with open(self._xpath() + '.tmp', 'w') as f:
+            f.write(json.dumps({ 'rows': list(self.x.keys()), 'at': list(self.x.values()) }, separators=(',', ':')))
+            if sync: 
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(self._xpath() + '.tmp', self._xpath())
+        self._kpatch()
+        self.xd, self.xk = False, {}
+    def _xclose(self):
+        if self.xd: self._xsave()
+        if self.u is not None: self.u.close()
+        self.x, self.u, self.xk = {}, None, {}
+    def _xread(self, row, raw):
+        k = self.x[row]
+        return None if k < 0 else self.u.readR(k, raw)
+    def _xunit(self, row, unit):
+        x = self._xread(row, False)
+        return x[unit] if (x and unit < len(x)) else None
+    def _xpatch(self, r, rows):
+        """ applies edits to a list of consecutive rows starting at row r """
+        return [ x for x in ((self._xread(r+k, False) if r+k in self.x else row) for k,row in enumerate(rows)) if x is not None ]
+    def _xedit(self, row):
+        if self.mode not in ('w', 'a'):
+            raise Exception('! Not open for writing - mode is [{}] !'.format(self.mode))
+        if not (0 <= row < self.len()):
+            raise Exception('! Row [{}] is not a closed record - no of rows is [{}] !'.format(row, self.len()))
+        self._cclear(row)
+        self.xd = True
+    def delete(self, *rows):
+        """ marks rows as deleted (tombstones), should be open in a write mode (w/a) """
+        for row in rows:
+            self._xedit(row)
+            self.x[row], self.xk[row] = -1, None
+    def update(self, row, *units):
+        """ replaces all units of a row, should be open in a write mode (w/a) 
+                the new record is written to the side list and the old one is ignored until compact() """
+        self._xedit(row)
+        if self.u is None:
+            self.u = self._xside()
+            self.u.open('a' if os.path.exists(self.u.index) else 'w')
+        self.x[row], self.xk[row] = self.u.len(), units
+        self.u.write(units)
+    def edits(self):
+        """ returns (no of deleted rows, no of updated rows) """
+        d = sum([ 1 for k in self.x.values() if k < 0 ])
+        return d, len(self.x) - d
+    def _twin(self, ext):
+        """ returns an empty list of the same kind whose files are named with ext added """
+        return iTOR(self.path + ext, self.index + ext, self.schema)
+    def _files(self):
+        """ files that hold the records and their index """
+        return [ self.path, self.index ]
+    #   compact() swaps files using a journal (<index>.swap) that lists the renames from new files to old ones
+    #   the journal is written only after the new files are complete and on disk - if a swap is interrupted,
+    #   the next open() or recover() finishes it (renames are repeated for new files that still exist)
+    def _jpath(self):
+        return self.index + '.swap'
+    def _swap(self):
+        """ finishes a pending swap of compact(), returns True if there was one """
+        if not os.path.exists(self._jpath()): return False
+        with open(self._jpath(), 'r') as f:
+            j = json.loads(f.read())
+        for a, b in j['swap']:
+            if os.path.exists(a): os.replace(a, b)
+        for x in j['drop']:
+            if os.path.exists(x): os.remove(x)
+        self._xdrop()
+        self._kreset()
+        os.remove(self._jpath()) #<--- last, so that an interrupted swap is repeated
+        return True
+    def _fsync(path):
+        with open(path, 'rb+') as f:
+            os.fsync(f.fileno())
+    def compact(self):
+        """ rewrites the list without deleted rows and with updated rows in place, returns the no of bytes reclaimed
+                live rows are streamed into a new list of files which then replace the old ones (see _swap)
+                an open list is closed and opened again in the same mode (a instead of w), key indices are rebuilt on next use """
+        mode = self.mode
+        if mode: self.close()
+        self._swap()
+        self._sopen('r')
+        u, n = self._xside(), self._twin('.compact')
+        before = sum([ os.path.getsize(x) for x in self._files() + [ self._xpath(), u.path, u.index ] if os.path.exists(x) ])
+        n.open('w')
+        for rows in self._iterC(): n.write(*rows)
+        n.close()
+        for x in n._files(): iTOR._fsync(x)
+        with open(self._jpath() + '.tmp', 'w') as f:
+            f.write(json.dumps({ 'swap': list(zip(n._files(), self._files())), 'drop': [ n.index + '.schema' ] }))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self._jpath() + '.tmp', self._jpath()) #<--- the swap is committed from here on
+        self._swap()
+        self._cclear()
+        if mode: self.open('a' if mode=='w' else mode)
+        return before - sum([ os.path.getsize(x) for x in self._files() if os.path.exists(x) ])
+
+
+    #<< recovery method ----------------------------------------------------------
+    def recover(self, truncate=False):
+        """ indexes complete records found in the data file after the last indexed record
+                (e.g. records written after the last checkpoint before a crash), should be called when closed
+                truncate=True also removes an incomplete record from the end of the data file
+                returns the number of records recovered """
+        if self.mode:
+            raise Exception('! Already open in [{}] mode - close it first!'.format(self.mode))
+        self._swap()
+        if not os.path.exists(self.path): return 0
+        self._sopen('r')
+        if [ t for t in (self.schema or []) if t!='str' ]:
+            raise Exception('! Cannot recover a list with binary unit types - seperators may appear inside units !')
+        i0, _, last = self._itail()
+        start = 0 if last is None else last+1
+        i, ir, u = array('Q'), array('Q'), [start]
+        sep = re.compile(b'[' + re.escape(self.US) + re.escape(self.RS) + b']')
+        ptr = start
+        for buffer in self._rscan(start):
+            for m in sep.finditer(buffer):
+                x = m.start()
+                if buffer[x]==self.GLOBAL_US:
+                    u.append(ptr + x + 1)
+                else:
+                    ir.append(i0 + len(i))
+                    i.extend(u)
+                    u = [ptr + x + 1]
+            ptr += len(buffer)
+        if ir:
+            with open(self.index, 'ab') as f:
+                iTOR._iwrite(f, i, ir)
+        if truncate and ptr > u[0]: self._rtruncate(u[0])
+        return len(ir)
+    def _rscan(self, start):
+        """ yields the contents of data file after start in chunks """
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            while True:
+                buffer = f.read(self.WBUF)
+                if not buffer: break
+                yield buffer
+    def _rtruncate(self, n):
+        """ truncates the data file to n bytes of record data """
+        with open(self.path, 'r+b') as f:
+            f.truncate(n)
 
 
     #<< info method     ----------------------------------------------------------
     def len(self):
-        return len(self.i)-1 if self.mode else 0
+        return self.r0 + len(self.ir)-1 if self.mode else 0
     def count(self, i):
-        return len(self.i[i])-1 if self.mode else -1
+        """ no of units in a row, returns -1 if the row is not held in memory (closed or already saved in write modes) """
+        return self.ir[i-self.r0+1]-self.ir[i-self.r0]-1 if (self.mode and i>=self.r0) else -1
     def info(self, p=print):
         m,l = self.mode, self.len()
         p('Mode[{}]/Len:[{}]'.format(m,l))
         if m:
             p('Count:')
-            for i in range(l):
+            for i in range(self.r0, l):
                 p('\t_{}_\t:\t[{}]'.format(i, self.count(i)))
 
-    def save(path, data):
-        itor = iTOR.create(path)
+    def save(path, data, schema=None):
+        itor = iTOR.create(path, schema=schema)
         itor.open()
         itor.write(*data)
         itor.close()
@@ -230,34 +1102,474 @@ class iTOR:
         return list(itor.iterR())
 
 
+#------------------------------------
+# block-compressed iTOR
+#------------------------------------
+class ziTOR(iTOR):
+    """ (z)ipped iTOR - an iTOR whose data file is stored as independently compressed blocks
+
+        the records are written in the same format as iTOR and the index holds the same (uncompressed) offsets
+        the data file is a sequence of compressed blocks of upto ZBLOCK bytes each
+        a third file (the block table) holds the uncompressed and compressed end offset of every block
+            self.zu, self.zc    uncompressed and compressed start offsets of blocks (with end offsets at the end)
+        a read decompresses only the blocks it needs, the last ZCACHE blocks are cached
+        mode m is not available
+    """
+    #<< class variables
+    ZMAGIC =        b'iTORblk\x01'          # block table file signature
+    ZENTRY =        Struct('<QQ')           # block table entry - (uncompressed end, compressed end)
+    ZBLOCK =        1<<16                   # no of uncompressed bytes in a block
+    ZCACHE =        16                      # no of decompressed blocks to cache
+    def create(path, codec='zlib', index_ext='.index', block_ext='.blocks', schema=None):
+        return ziTOR(path, os.path.join(os.path.dirname(path), os.path.basename(path) + index_ext), 
+                    os.path.join(os.path.dirname(path), os.path.basename(path) + block_ext), codec, schema)
+    def save(path, data, codec='zlib', schema=None):
+        itor = ziTOR.create(path, codec, schema=schema)
+        itor.open()
+        itor.write(*data)
+        itor.close()
+    def load(path):
+        itor = ziTOR.create(path)
+        return list(itor.iterR())
+
+
+    #<< dunder methods      ----------------------------------------------------------
+    def __init__(self, data_file_path, index_file_path, block_file_path, codec='zlib', schema=None) -> None:
+        super().__init__(data_file_path, index_file_path, schema)
+        self.blocks = block_file_path
+        self.codec = codec #<--- codec of an existing block table takes priority
+
+
+    #<< block table methods ----------------------------------------------------------
+    def _zopen(self, mode):
+        self.zu, self.zc = array('Q', [0]), array('Q', [0])
+        if mode=='w' or not os.path.exists(self.blocks):
+            with open(self.blocks, 'wb') as f:
+                f.write(self.ZMAGIC + self.codec.encode('utf-8').ljust(8, b'\0'))
+        else:
+            with open(self.blocks, 'rb') as f:
+                buffer = f.read()
+            if not buffer.startswith(self.ZMAGIC):
+                raise Exception('! Not a block table [{}] !'.format(self.blocks))
+            self.codec = buffer[8:16].rstrip(b'\0').decode('utf-8')
+            n = (len(buffer) - 16)//self.ZENTRY.size #<--- a partially written entry is ignored
+            for u, c in self.ZENTRY.iter_unpack(buffer[16:16 + n*self.ZENTRY.size]):
+                self.zu.append(u)
+                self.zc.append(c)
+        self.compress, self.decompress = _zcodec(self.codec)
+        self.zcache, self.zlock = OrderedDict(), Lock()
+    def _zclose(self):
+        del self.zu, self.zc, self.zcache, self.zlock, self.compress, self.decompress
+    def _dsize(self):
+        return self.zu[-1]
+    def _twin(self, ext):
+        if os.path.exists(self.blocks): #<--- same codec as the existing block table
+            with open(self.blocks, 'rb') as f:
+                self.codec = f.read(16)[8:16].rstrip(b'\0').decode('utf-8')
+        return ziTOR(self.path + ext, self.index + ext, self.blocks + ext, self.codec, self.schema)
+    def _files(self):
+        return [ self.path, self.index, self.blocks ]
+    def _plan(self, a, b):
+        j, k = bisect_right(self.zu, a) - 1, bisect_left(self.zu, b)
+        return self.codec, self.zu[j:k+1], self.zc[j:k+1]
+
+
+    #<< open/close methods  ----------------------------------------------------------
+    def open(self, mode='w', lazy=False):
+        """ opens the list - same as iTOR.open() except that mode m is not available """
+        if mode=='m': raise Exception('! Mode [m] is not available for compressed data files !')
+        if not self.mode:
+            self._swap() #<--- before the block table is read
+            self._zopen(mode)
+            try:
+                super().open(mode, lazy)
+            except:
+                self._zclose()
+                raise
+        else:
+            super().open(mode, lazy)
+    def close(self):
+        """ closes the list, should be called to free resources """
+        opened = bool(self.mode)
+        super().close()
+        if opened: self._zclose()
+    def _wopen(self):
+        super()._wopen()
+        self.f.truncate(self.zc[-1]) #<--- drops compressed data that is not in the block table
+
+
+    #<< write methods       ----------------------------------------------------------
+    def _wflush(self):
+        if self.b:
+            zu, zc = array('Q'), array('Q')
+            for k in range(0, len(self.b), self.ZBLOCK):
+                block = self.b[k:k+self.ZBLOCK]
+                data = self.compress(block)
+                self.f.write(data)
+                zu.append(self.zu[-1] + len(block))
+                zc.append(self.zc[-1] + len(data))
+                self.zu.append(zu[-1])
+                self.zc.append(zc[-1])
+            self.b.clear()
+            self.f.flush() #<--- blocks must reach the file before the block table that points into them
+            with open(self.blocks, 'ab') as f:
+                f.write(b''.join([ self.ZENTRY.pack(u, c) for u, c in zip(zu, zc) ]))
+
+
+    #<< read methods        ----------------------------------------------------------
+    def _block(self, k):
+        with self.zlock:
+            data = self.zcache.get(k, None)
+            if data is not None:
+                self.zcache.move_to_end(k)
+                return data
+        data = self.decompress(iTOR._read(self, self.zc[k], self.zc[k+1] - self.zc[k]))
+        with self.zlock:
+            self.zcache[k] = data
+            if len(self.zcache) > self.ZCACHE: self.zcache.popitem(last=False)
+        return data
+    def _read(self, a, n):
+        k, res = bisect_right(self.zu, a) - 1, []
+        while n > 0 and k < len(self.zu) - 1:
+            data = self._block(k)[a - self.zu[k] : a - self.zu[k] + n]
+            res.append(data)
+            a, n, k = a + len(data), n - len(data), k + 1
+        return res[0] if len(res)==1 else b''.join(res)
+
+
+    #<< recovery methods    ----------------------------------------------------------
+    def _rscan(self, start):
+        self._zopen('r')
+        try:
+            with open(self.path, 'rb') as self.f:
+                k = max(bisect_right(self.zu, start) - 1, 0)
+                for k in range(k, len(self.zu) - 1):
+                    yield self._block(k)[max(start - self.zu[k], 0):]
+        finally:
+            del self.f
+            self._zclose()
+    def _rtruncate(self, n):
+        self._zopen('r')
+        try:
+            k = bisect_right(self.zu, n) - 1
+            with open(self.path, 'r+b') as self.f:
+                data = self._block(k)[:n - self.zu[k]] if n > self.zu[k] else b''
+                self.f.truncate(self.zc[k])
+                self.f.seek(self.zc[k])
+                if data: self.f.write(self.compress(data))
+                c = self.f.tell()
+            with open(self.blocks, 'r+b') as f:
+                f.truncate(16 + k*self.ZENTRY.size)
+                f.seek(0, 2)
+                if data: f.write(self.ZENTRY.pack(n, c))
+        finally:
+            del self.f
+            self._zclose()
+
+
+#------------------------------------
+# sharded iTOR
+#------------------------------------
+def _sscan(path, codec, fn, keep):
+    """ applies fn on every row of a shard, see _iscan """
+    itor = ziTOR.create(path, codec) if codec else iTOR.create(path)
+    return [ row for row in itor.iterR() if fn(row) ] if keep else [ fn(row) for row in itor.iterR() ]
+class siTOR:
+    """ (s)harded iTOR - a single list of records that is stored as many iTORs (shards)
+
+        rows are always written to the last shard, a new shard is started when it reaches max_rows rows or max_bytes bytes
+        a manifest file (json) holds these settings and the no of rows in each shard
+            shard k is stored at <path>.<k> (and <path>.<k>.index) - it is a ziTOR if a codec is given
+        rows are numbered across shards, in read modes shards are opened only when they are needed
+    """
+    #<< class variables
+    SOPEN =         8                       # no of shards kept open in r/m modes (all shards are kept open in p mode)
+    SBATCH =        1<<10                   # no of rows written between checks for max_bytes
+    def create(path, max_rows=None, max_bytes=None, codec=None, schema=None, manifest_ext='.shards'):
+        return siTOR(path, os.path.join(os.path.dirname(path), os.path.basename(path) + manifest_ext), max_rows, max_bytes, codec, schema)
+    def save(path, data, max_rows=None, max_bytes=None, codec=None, schema=None):
+        stor = siTOR.create(path, max_rows, max_bytes, codec, schema)
+        stor.open()
+        stor.write(*data)
+        stor.close()
+    def load(path):
+        stor = siTOR.create(path)
+        return list(stor.iterR())
+
+
+    #<< dunder methods      ----------------------------------------------------------
+    def __init__(self, path, manifest_path, max_rows=None, max_bytes=None, codec=None, schema=None) -> None:
+        if max_rows is not None and max_rows<1: raise Exception('! max_rows should be at least 1, got [{}] !'.format(max_rows))
+        if max_bytes is not None and max_bytes<1: raise Exception('! max_bytes should be at least 1, got [{}] !'.format(max_bytes))
+        self.path = path
+        self.manifest = manifest_path
+        self.max_rows, self.max_bytes, self.codec, self.schema = max_rows, max_bytes, codec, schema #<--- in a/r/m/p modes, settings of an existing manifest take priority
+        self.mode = '' #<-- is closed
+    def __iter__(self):
+        return self.iterR()
+    def __len__(self):
+        return self.len()
+
+
+    #<< manifest methods    ----------------------------------------------------------
+    def _mload(self, settings=True):
+        """ loads the manifest (if any) and returns it, its settings replace the current ones only if settings is True """
+        self.rows, m = [], {}
+        if os.path.exists(self.manifest):
+            with open(self.manifest, 'r') as f:
+                m = json.loads(f.read())
+            if settings:
+                self.max_rows, self.max_bytes, self.codec, self.rows = m['max_rows'], m['max_bytes'], m['codec'], m['rows']
+                self.schema = m.get('schema', None)
+        return m
+    def _msave(self):
+        with open(self.manifest + '.tmp', 'w') as f:
+            f.write(json.dumps({'max_rows': self.max_rows, 'max_bytes': self.max_bytes, 'codec': self.codec, 'schema': self.schema, 'rows': self.rows}, 
+                               sort_keys=False, indent=4))
+        os.replace(self.manifest + '.tmp', self.manifest)
+    def _spath(self, k):
+        return '{}.{}'.format(self.path, k)
+    def _shard(self, k, codec=None):
+        codec = codec or self.codec
+        return ziTOR.create(self._spath(k), codec, schema=self.schema) if codec else iTOR.create(self._spath(k), schema=self.schema)
+
+
+    #<< open/close methods  ----------------------------------------------------------
+    def open(self, mode='w', lazy=False):
+        """ opens the list, mode should be one of w/a/r/m/p, lazy applies to shard indices (see iTOR.open) """
+        if self.mode:
+            print('! Already open in [{}] mode !'.format(self.mode))
+            return
+        m = self._mload(settings=(mode!='w')) #<--- in w mode, settings passed to the constructor are kept
+        if mode=='w':
+            codec = m.get('codec', None) #<--- old shards are removed using the old rows and codec
+            for k in range(len(m.get('rows', []))):
+                s = self._shard(k, codec)
+                if k: ps = [s.path, s.index, s.index + '.schema', getattr(s, 'blocks', '')]
+                else: ps = [getattr(s, 'blocks', '')] if codec!=self.codec else [] #<--- shard 0 is overwritten, except blocks of an old codec
+                for p in ps:
+                    if p and os.path.exists(p): os.remove(p)
+            self.rows = [0]
+        elif mode=='a':
+            if not self.rows: self.rows = [0]
+        if mode in ('w', 'a'):
+            self.w = self._shard(len(self.rows)-1)
+            self.w.open(mode)
+            self.n = sum(self.rows[:-1]) #<--- no of rows in previous shards
+        else:
+            self.o, self.olock, self.lazy = OrderedDict(), Lock(), lazy
+            if self.rows: #<--- rows of the last shard can be ahead of manifest
+                last = self._shard(len(self.rows)-1)
+                last.open(mode, lazy)
+                self.rows[-1] = last.len()
+                self.o[len(self.rows)-1] = last
+            self.s = list(accumulate(self.rows, initial=0))
+        self.mode = mode
+        if mode in ('w', 'a'): self._msave()
+    def close(self):
+        """ closes the list, should be called to free resources """
+        if not self.mode:
+            print('! Already closed !')
+            return
+        if self.mode in ('w', 'a'):
+            self.rows[-1] = self.w.len()
+            self.w.close()
+            self._msave()
+            del self.w, self.n
+        else:
+            for s in self.o.values(): s.close()
+            del self.o, self.olock, self.lazy, self.s
+        del self.rows
+        self.mode = ''
+
+
+    #<< write methods       ----------------------------------------------------------
+    def _full(self):
+        return (self.max_rows is not None and self.w.len() >= self.max_rows) or \
+               (self.max_bytes is not None and self.w.p >= self.max_bytes)
+    def _rollover(self):
+        self.rows[-1] = self.w.len()
+        self.w.close()
+        self.n += self.rows[-1]
+        self.rows.append(0)
+        self.w = self._shard(len(self.rows)-1)
+        self.w.open('w')
+        self._msave()
+    def write(self, *rows):
+        """ writes multiple rows at once, a new shard is started whenever the last one is full """
+        k = 0
+        while k < len(rows):
+            if self._full(): self._rollover()
+            n = self.SBATCH if self.max_rows is None else min(self.SBATCH, self.max_rows - self.w.len())
+            self.w.write(*rows[k:k+n])
+            k += n
+    def writeR(self, *units):
+        """ writes one full row """
+        self.write(units)
+    def checkpoint(self, sync=False):
+        """ checkpoints the last shard (see iTOR.checkpoint) and saves the manifest """
+        self.w.checkpoint(sync)
+        self.rows[-1] = self.w.len()
+        self._msave()
+
+
+    #<< read methods        ----------------------------------------------------------
+    def _get(self, k):
+        """ returns shard k opened in current read mode """
+        with self.olock:
+            s = self.o.get(k, None)
+            if s is None:
+                s = self._shard(k)
+                s.open(self.mode, self.lazy)
+                self.o[k] = s
+                if self.mode!='p' and len(self.o) > self.SOPEN: self.o.popitem(last=False)[1].close()
+            elif self.mode!='p':
+                self.o.move_to_end(k)
+            return s
+    def locate(self, row):
+        """ returns (shard no, row no in shard) of a row """
+        if row < 0: row += self.len()
+        k = bisect_right(self.s, row) - 1
+        if not (0 <= row < self.s[-1]): raise IndexError('! Row [{}] out of range !'.format(row))
+        return k, row - self.s[k]
+    def readU(self, row, unit, raw=False):
+        k, r = self.locate(row)
+        return self._get(k).readU(r, unit, raw)
+    def readR(self, row, raw=False):
+        k, r = self.locate(row)
+        return self._get(k).readR(r, raw)
+    def read(self, *rows, raw=False):
+        return [ self.readR(row, raw) for row in rows ]
+    def readA(self, raw=False):
+        return self.read(*range(len(self)), raw=raw)
+
+
+    #<< generator methods   ----------------------------------------------------------
+    def iterR(self):
+        opened = not self.mode
+        if opened:
+            self._mload()
+        elif self.mode in ('w', 'a'):
+            raise Exception('! Already open in [{}] mode - close it first!'.format(self.mode))
+        for k in range(len(self.rows)):
+            yield from self._shard(k).iterR()
+        if opened: del self.rows
+    def iterU(self):
+        for row in self.iterR():
+            yield from row
+            yield None #<--- None to mark end of row
+    def iter_batches(self, n):
+        """ generator - yields lists of n rows (the last list can be shorter) """
+        batch = []
+        for row in self.iterR():
+            batch.append(row)
+            if len(batch)==n:
+                yield batch
+                batch = []
+        if batch: yield batch
+    def parallel_map(self, fn, workers=None, ordered=True):
+        """ generator - applies fn on every row using a pool of processes (one shard at a time per process) and yields the results 
+                results are yielded in row order if ordered=True, otherwise in the order that shards finish """
+        return self._parallel(fn, False, workers, ordered)
+    def parallel_filter(self, fn, workers=None, ordered=True):
+        """ generator - same as parallel_map but yields the rows for which fn(row) is true """
+        return self._parallel(fn, True, workers, ordered)
+    def _parallel(self, fn, keep, workers, ordered):
+        if self.mode in ('w', 'a'):
+            raise Exception('! Already open in [{}] mode - close it first!'.format(self.mode))
+        if not self.mode: self._mload()
+        from concurrent.futures import ProcessPoolExecutor #<--- imported on first use (loads multiprocessing)
+        with ProcessPoolExecutor(workers) as ex:
+            jobs = [ ex.submit(_sscan, self._spath(k), self.codec, fn, keep) for k in range(len(self.rows)) ]
+            for job in (jobs if ordered else as_completed(jobs)):
+                yield from job.result()
+
+
+    #<< info methods        ----------------------------------------------------------
+    def len(self):
+        if self.mode in ('w', 'a'): return self.n + self.w.len()
+        return self.s[-1] if self.mode else 0
+    def info(self, p=print):
+        m,l = self.mode, self.len()
+        p('Mode[{}]/Len:[{}]'.format(m,l))
+        if m:
+            p('Shards:')
+            for k, n in enumerate(self.rows):
+                p('\t_{}_\t:\t[{}]'.format(k, n))
+
+
 #------------------------------------
 # multi context manager for iTOR
 #------------------------------------
 class MCM:
-    """ multi context-manager """
-    def from_lot(*lot):
+    """ multi context-manager 
+    
+        members are opened and closed in parallel on a pool of upto workers threads (None for default)
+        the generators zip(), concat() and merge() stream rows of many members together (members should have iterR)
+        a member opened in mode r/m is closed by its generator when it is exhausted (see iTOR._iterC)
+    """
+    def from_lot(*lot, workers=None):
         ds, mode = [], []
         for d,m in lot:
             ds.append(d)
             mode.append(m)
-        return MCM(ds, mode)
-    def from_list(dsL, mode):
-        return MCM(dsL, [mode for _ in range(len(dsL))] )
-    def from_lists(dsL, modeL):
-        return MCM(dsL, modeL)
-
-    def __init__(self, ds, mode) -> None:
-        self.ds, self.mode = ds, mode
+        return MCM(ds, mode, workers)
+    def from_list(dsL, mode, workers=None):
+        return MCM(dsL, [mode for _ in range(len(dsL))], workers)
+    def from_lists(dsL, modeL, workers=None):
+        return MCM(dsL, modeL, workers)
+
+    def __init__(self, ds, mode, workers=None) -> None:
+        self.ds, self.mode, self.workers = ds, mode, workers
     def __enter__(self):
-        for ds, mode in zip(self.ds, self.mode):
-            ds.open(mode)
+        self.open()
         return self.ds
     def __exit__(self, exc_type, exc_val, exc_tb):
-        for ds in self.ds:
-            ds.close()
+        self.close()
         return True
 
 
+    #<< open/close methods  ----------------------------------------------------------
+    def _each(self, fn, args):
+        """ calls fn on all args in parallel, returns a list of exceptions (None for calls that did not fail) """
+        if len(args) < 2: 
+            res = []
+            for x in args:
+                try:
+                    fn(*x)
+                    res.append(None)
+                except Exception as e:
+                    res.append(e)
+            return res
+        with ThreadPoolExecutor(self.workers) as ex:
+            jobs = [ ex.submit(fn, *x) for x in args ]
+        return [ job.exception() for job in jobs ]
+    def open(self):
+        """ opens all members, if any member fails to open then the ones that were opened are closed """
+        err = self._each(lambda ds, mode: ds.open(mode), list(zip(self.ds, self.mode)))
+        if any(e is not None for e in err):
+            self._each(lambda ds: ds.close(), [ (ds,) for ds, e in zip(self.ds, err) if e is None and ds.mode ])
+            raise [ e for e in err if e is not None ][0]
+    def close(self):
+        """ closes all open members, raises the first exception after trying to close every member """
+        err = [ e for e in self._each(lambda ds: ds.close(), [ (ds,) for ds in self.ds if ds.mode ]) if e is not None ]
+        if err: raise err[0]
+
+
+    #<< generator methods   ----------------------------------------------------------
+    def zip(self):
+        """ generator - yields a tuple of rows (one from each member), stops at the shortest member """
+        return zip(*[ ds.iterR() for ds in self.ds ])
+    def concat(self):
+        """ generator - yields all rows of first member, then all rows of second member and so on """
+        for ds in self.ds: 
+            yield from ds.iterR()
+    def merge(self, key=None, reverse=False):
+        """ generator - k-way merge, yields rows of all members in sorted order of key(row) 
+                rows of each member should already be sorted by the same key """
+        return merge(*[ ds.iterR() for ds in self.ds ], key=key, reverse=reverse)
+
+
 
 
 #-----------------------------------------------------------------------------------------------------